@@ -0,0 +1,3 @@
+"""Benchmarks of ftl_localizer on a synthetic FTL mod,
+run with python -m benchmarks.run
+"""
@@ -0,0 +1,260 @@
+"""Generates a synthetic FTL mod for benchmarks: event files with nested
+events and choices, text lists, enemy ships, blueprints, sectors,
+achievements, animations with no text and text files with already
+defined strings.
+Same size and seed always give the same files.
+"""
+
+import os
+import random
+
+WORDS = ['ship', 'crew', 'rebel', 'fleet', 'beacon', 'scrap', 'fuel', 'drone',
+         'missile', 'hull', 'shield', 'engine', 'nebula', 'station', 'slug',
+         'mantis', 'engi', 'zoltan', 'rockman', 'pirate', 'merchant', 'distress',
+         'signal', 'asteroid', 'sun', 'store', 'sector', 'federation', 'outpost',
+         'colony', 'reactor', 'oxygen', 'medbay', 'airlock', 'cloak', 'teleporter',
+         'you', 'the', 'a', 'of', 'and', 'to', 'is', 'with', 'your', 'their']
+
+ENDINGS = ['.', '.', '.', '!', '?', '...', ' & more.', ' "quoted".', " isn't it?"]
+
+SHIP_EVENTS = ['destroyed', 'deadCrew', 'surrender', 'escape', 'gotaway']
+
+HEADER = '<?xml version="1.0" encoding="utf-8"?>\n' \
+         '<!-- Copyright (c) 2012 by Subset Games. All rights reserved -->\n'
+
+
+def generate_corpus(directory, size=100, seed=0):
+    """Writes synthetic mod files to directory.
+
+    :param directory: Folder for xml files, created if needed.
+
+    :param size: Number of top level events, other parts of the mod
+        are scaled from it.
+
+    :param seed: Seed of random generator.
+
+    Returns list of written file names.
+    """
+    rnd = random.Random(seed)
+    # Some strings repeat across the mod, like in vanilla files
+    repeated = []
+
+    def sentence():
+        """Random text string, escaped for xml."""
+        if repeated and rnd.random() < 0.1:
+            return rnd.choice(repeated)
+        words = [rnd.choice(WORDS) for _ in range(rnd.randint(3, 25))]
+        words[0] = words[0].capitalize()
+        string = ' '.join(words) + rnd.choice(ENDINGS)
+        string = string.replace('&', '&amp;')
+        if rnd.random() < 0.05:
+            repeated.append(string)
+        return string
+
+    def indent(level):
+        """Tab indent of FTL files."""
+        return '\t' * level
+
+    def choice_tree(level, depth):
+        """Choices with nested events."""
+        result = []
+        for _ in range(rnd.randint(1, 3)):
+            hidden = ' hidden="true"' if rnd.random() < 0.5 else ''
+            result.append(f'{indent(level)}<choice{hidden}>\n')
+            result.append(f'{indent(level + 1)}<text>{sentence()}</text>\n')
+            roll = rnd.random()
+            if depth > 0 and roll < 0.6:
+                result.extend(event(level + 1, depth - 1))
+            elif roll < 0.8:
+                result.append(f'{indent(level + 1)}'
+                              f'<event load="EVENT_{rnd.randint(0, size)}"/>\n')
+            else:
+                result.append(f'{indent(level + 1)}<event/>\n')
+            result.append(f'{indent(level)}</choice>\n')
+        return result
+
+    def event(level, depth, name=None):
+        """Event with text, rewards and choices."""
+        attrs = f' name="{name}"' if name is not None else ''
+        result = [f'{indent(level)}<event{attrs}>\n',
+                  f'{indent(level + 1)}<text>{sentence()}</text>\n']
+        if rnd.random() < 0.3:
+            result.append(f'{indent(level + 1)}<autoReward level="MED">standard</autoReward>\n')
+        if rnd.random() < 0.2:
+            result.append(f'{indent(level + 1)}<ship load="SHIP_{rnd.randint(0, size)}" '
+                          f'hostile="true"/>\n')
+        if rnd.random() < 0.1:
+            result.append(f'{indent(level + 1)}<crewMember amount="1" class="human">'
+                          f'{rnd.choice(WORDS).capitalize()}</crewMember>\n')
+        if depth > 0:
+            result.extend(choice_tree(level + 1, depth))
+        result.append(f'{indent(level)}</event>\n')
+        return result
+
+    def ship(name):
+        """Enemy ship with texts for its fate."""
+        result = [f'<ship name="{name}" auto_blueprint="SHIPS_HOSTILE">\n']
+        for tag in rnd.sample(SHIP_EVENTS, rnd.randint(2, len(SHIP_EVENTS))):
+            result.append(f'\t<{tag}>\n\t\t<text>{sentence()}</text>\n')
+            if rnd.random() < 0.5:
+                result.extend(choice_tree(2, 1))
+            result.append(f'\t</{tag}>\n')
+        result.append('\t<crew>\n\t\t<crewMember type="human" prop="0.5"/>\n\t</crew>\n</ship>\n')
+        return result
+
+    def events_file(prefix, number):
+        """Events, event lists, text lists and ships."""
+        result = [HEADER, '<FTL>\n']
+        for i in range(number):
+            result.extend(event(0, rnd.randint(1, 3), f'{prefix}_{i}'))
+            if i % 5 == 0:
+                result.append(f'<eventList name="{prefix}_LIST_{i}">\n')
+                for _ in range(rnd.randint(2, 4)):
+                    result.extend(event(1, 2))
+                result.append(f'\t<event load="{prefix}_{i}"/>\n</eventList>\n')
+            if i % 7 == 0:
+                result.append(f'<textList name="{prefix}_TEXTS_{i}">\n')
+                result.extend(f'\t<text>{sentence()}</text>\n' for _ in range(rnd.randint(2, 6)))
+                result.append('</textList>\n')
+            if i % 4 == 0:
+                result.extend(ship(f'{prefix}_SHIP_{i}'))
+            if i % 11 == 0:
+                result.append(f'<event name="{prefix}_CONTINUE_{i}">\n'
+                              f'\t<text id="continue"/>\n</event>\n')
+        result.append('</FTL>\n')
+        return result
+
+    def blueprints_file(number):
+        """Weapons, drones, augments, crew and player ships."""
+        result = [HEADER, '<FTL>\n']
+        for i in range(number):
+            result.append(f'<weaponBlueprint name="WEAPON_{i}">\n\t<type>LASER</type>\n'
+                          f'\t<title>{sentence()}</title>\n\t<short>{sentence()}</short>\n'
+                          f'\t<desc>{sentence()}</desc>\n\t<tooltip>{sentence()}</tooltip>\n'
+                          f'\t<flavorType>{sentence()}</flavorType>\n'
+                          f'\t<damage>{rnd.randint(1, 4)}</damage>\n'
+                          f'\t<cost>{rnd.randint(20, 90)}</cost>\n'
+                          f'</weaponBlueprint>\n')
+            result.append(f'<droneBlueprint name="DRONE_{i}">\n\t<type>COMBAT</type>\n'
+                          f'\t<title>{sentence()}</title>\n\t<short>{sentence()}</short>\n'
+                          f'\t<desc>{sentence()}</desc>\n\t<power>2</power>\n</droneBlueprint>\n')
+            result.append(f'<augBlueprint name="AUG_{i}">\n\t<title>{sentence()}</title>\n'
+                          f'\t<desc>{sentence()}</desc>\n\t<cost>50</cost>\n</augBlueprint>\n')
+            if i % 3 == 0:
+                result.append(f'<crewBlueprint name="CREW_{i}">\n\t<desc>{sentence()}</desc>\n'
+                              f'\t<title>{sentence()}</title>\n\t<short>{sentence()}</short>\n'
+                              f'\t<powerList>\n')
+                result.extend(f'\t\t<power>{sentence()}</power>\n'
+                              for _ in range(rnd.randint(1, 4)))
+                result.append('\t</powerList>\n</crewBlueprint>\n')
+            if i % 5 == 0:
+                result.append(f'<shipBlueprint name="PLAYER_SHIP_{i}" layout="kestral" '
+                              f'img="kestral">\n'
+                              f'\t<class>{sentence()}</class>\n\t<name>{sentence()}</name>\n'
+                              f'\t<unlock>{sentence()}</unlock>\n\t<desc>{sentence()}</desc>\n'
+                              f'\t<crewCount amount="3" class="human"/>\n</shipBlueprint>\n')
+        result.append('<blueprintList name="WEAPONS_LIST">\n')
+        result.extend(f'\t<name>WEAPON_{i}</name>\n' for i in range(number))
+        result.append('</blueprintList>\n</FTL>\n')
+        return result
+
+    def sectors_file(number):
+        """Sector descriptions with name lists."""
+        result = [HEADER, '<FTL>\n']
+        for i in range(number):
+            result.append(f'<sectorDescription name="SECTOR_{i}" minSector="{i % 8}">\n'
+                          f'\t<nameList>\n')
+            result.extend(f'\t\t<name>{sentence()}</name>\n' for _ in range(rnd.randint(1, 3)))
+            result.append(f'\t</nameList>\n\t<startEvent>EVENT_{i}</startEvent>\n'
+                          f'\t<event name="EVENT_LIST_{i - i % 5}" min="1" max="3"/>\n'
+                          f'</sectorDescription>\n')
+        result.append('</FTL>\n')
+        return result
+
+    def achievements_file(number):
+        """Achievements with names and descriptions."""
+        result = [HEADER, '<FTL>\n']
+        for i in range(number):
+            result.append(f'<achievement id="ACH_{i}">\n\t<name>{sentence()}</name>\n'
+                          f'\t<desc>{sentence()}</desc>\n\t<img>achievements/ach_{i}.png</img>\n'
+                          f'</achievement>\n')
+        result.append('</FTL>\n')
+        return result
+
+    def animations_file(number):
+        """Animation sheets and animations, there is no text in them."""
+        result = [HEADER, '<FTL>\n']
+        for i in range(number):
+            w, h = rnd.choice([(35, 35), (64, 64), (160, 32)])
+            result.append(f'<animSheet name="sheet_{i}" w="{w * 8}" h="{h}" fw="{w}" fh="{h}">'
+                          f'effects/sheet_{i}.png</animSheet>\n')
+            for j in range(rnd.randint(1, 4)):
+                result.append(f'<anim name="anim_{i}_{j}">\n\t<sheet>sheet_{i}</sheet>\n'
+                              f'\t<desc length="{rnd.randint(2, 8)}" x="0" y="{j}"/>\n'
+                              f'\t<time>{rnd.randint(1, 20) / 10}</time>\n</anim>\n')
+        result.append('</FTL>\n')
+        return result
+
+    def text_file(prefix, number, lang=None):
+        """Already defined strings."""
+        attrs = f' language="{lang}"' if lang is not None else ''
+        result = [HEADER, '<FTL>\n']
+        result.extend(f'<text name="{prefix}_{i}"{attrs}>{sentence()}</text>\n'
+                      for i in range(number))
+        result.append('</FTL>\n')
+        return result
+
+    os.makedirs(directory, exist_ok=True)
+    files = {'events.xml': events_file('EVENT', size),
+             'events_ships.xml': events_file('SHIP_EVENT', max(size // 4, 1)),
+             'blueprints.xml': blueprints_file(max(size // 2, 1)),
+             'sector_data.xml': sectors_file(max(size // 10, 1)),
+             'achievements.xml': achievements_file(max(size // 5, 1)),
+             'tutorial.xml': events_file('TUTORIAL', max(size // 20, 1)),
+             'animations.xml': animations_file(size * 2),
+             'text_tooltips.xml': text_file('tooltip', max(size // 2, 1)),
+             'text_misc.xml': text_file('misc', size),
+             'text-ru.xml': text_file('misc', size, 'ru'),
+             'text-de.xml': text_file('misc', size // 2, 'de')}
+    for filename, pieces in files.items():
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as file:
+            file.write(''.join(pieces))
+    return list(files)
+
+
+def generate_event_list(directory, events=10000, seed=0):
+    """Writes events.xml with one eventList of events with nested
+    choices, the worst case for id generation: ids of nested texts
+    depend on all choices above them.
+
+    :param directory: Folder for the file, created if needed.
+
+    :param events: Number of events in the list.
+
+    :param seed: Seed of random generator.
+
+    Returns the file name.
+    """
+    rnd = random.Random(seed)
+
+    def event(level, depth):
+        """Event with text and choices with nested events."""
+        tabs = '\t' * level
+        result = [f'{tabs}<event>\n', f'{tabs}\t<text>Event {rnd.randint(0, 10 ** 6)}.</text>\n']
+        if depth > 0:
+            for _ in range(rnd.randint(1, 3)):
+                result.append(f'{tabs}\t<choice>\n'
+                              f'{tabs}\t\t<text>Choice {rnd.randint(0, 10 ** 6)}.</text>\n')
+                result.extend(event(level + 2, depth - 1))
+                result.append(f'{tabs}\t</choice>\n')
+        result.append(f'{tabs}</event>\n')
+        return result
+
+    pieces = [HEADER, '<FTL>\n<eventList name="BENCHMARK_LIST">\n']
+    for _ in range(events):
+        pieces.extend(event(1, rnd.randint(0, 2)))
+    pieces.append('</eventList>\n</FTL>\n')
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'events.xml'), 'w', encoding='utf-8') as file:
+        file.write(''.join(pieces))
+    return 'events.xml'
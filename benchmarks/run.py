@@ -0,0 +1,249 @@
+"""Runs benchmark scenarios on a synthetic mod and writes a JSON report
+with time and peak memory of each scenario.
+
+Usage: python -m benchmarks.run [--size 100] [--repeat 3] [--output report.json]
+Compare with an older report: --baseline old.json exits with code 1
+if any scenario got slower or its peak memory got bigger than
+--threshold times.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ftl_localizer
+from benchmarks.corpus import generate_corpus, generate_event_list
+
+REPORT_VERSION = 1
+
+
+def scenario_parse(workdir, outputdir, engine):
+    """Parsing of all files."""
+    return lambda: ftl_localizer.parse(workdir, engine)
+
+
+def scenario_localize(workdir, outputdir, engine):
+    """Localize with default options."""
+    return lambda: ftl_localizer.localize(workdir, outputdir, 'ru', engine=engine)
+
+
+def scenario_localize_same_strings(workdir, outputdir, engine):
+    """Localize combining same text strings."""
+    return lambda: ftl_localizer.localize(workdir, outputdir, 'ru', check_same_strings=True,
+                                          engine=engine)
+
+
+def scenario_localize_split(workdir, outputdir, engine):
+    """Localize with result split into categories."""
+    return lambda: ftl_localizer.localize(workdir, outputdir, 'ru', split_result=True,
+                                          engine=engine)
+
+
+def scenario_localize_low_memory(workdir, outputdir, engine):
+    """Localize without keeping parsed files in memory."""
+    return lambda: ftl_localizer.localize(workdir, outputdir, 'ru', engine=engine,
+                                          low_memory=True)
+
+
+def scenario_localize_fsync(workdir, outputdir, engine):
+    """Localize with each result file flushed to disk."""
+    return lambda: ftl_localizer.localize(workdir, outputdir, 'ru', engine=engine, fsync=True)
+
+
+def localized_mod(workdir, outputdir, engine):
+    """Localizes the corpus for delocalize scenarios, returns its folder."""
+    localized = f'{outputdir}_localized'
+    shutil.rmtree(localized, ignore_errors=True)
+    with io_sink() as sink, contextlib.redirect_stdout(sink):
+        ftl_localizer.localize(workdir, localized, 'ru', engine=engine)
+    return localized
+
+
+def scenario_delocalize(workdir, outputdir, engine):
+    """Delocalize of the localized mod."""
+    localized = localized_mod(workdir, outputdir, engine)
+    return lambda: ftl_localizer.delocalize(localized, outputdir, 'ru', engine=engine)
+
+
+def scenario_delocalize_low_memory(workdir, outputdir, engine):
+    """Delocalize without keeping parsed files in memory."""
+    localized = localized_mod(workdir, outputdir, engine)
+    return lambda: ftl_localizer.delocalize(localized, outputdir, 'ru', engine=engine,
+                                            low_memory=True)
+
+
+def scenario_coverage_report(workdir, outputdir, engine):
+    """Coverage report of the localized mod for all languages."""
+    localized = localized_mod(workdir, outputdir, engine)
+    return lambda: ftl_localizer.coverage_report(localized, engine=engine)
+
+
+def scenario_find_strings_to_localize(workdir, outputdir, engine):
+    """Id generation for a list of 10k events with nested choices,
+    the file is parsed before timing. benchmarks.text_ids compares
+    it with the previous version.
+    """
+    events_dir = f'{outputdir}_events'
+    filename = generate_event_list(events_dir, 10000)
+    with io_sink() as sink, contextlib.redirect_stdout(sink):
+        soup = ftl_localizer.parse_file(events_dir, filename, engine)
+    return lambda: ftl_localizer.find_strings_to_localize(soup)
+
+
+def scenario_pretty_xml(workdir, outputdir, engine):
+    """Serialization of already parsed files."""
+    with io_sink() as sink, contextlib.redirect_stdout(sink):
+        soups = ftl_localizer.parse(workdir, engine)
+    return lambda: [ftl_localizer.pretty_xml(soup[0]) for soup in soups]
+
+
+SCENARIOS = {'parse': scenario_parse,
+             'localize': scenario_localize,
+             'localize_same_strings': scenario_localize_same_strings,
+             'localize_split': scenario_localize_split,
+             'localize_low_memory': scenario_localize_low_memory,
+             'localize_fsync': scenario_localize_fsync,
+             'delocalize': scenario_delocalize,
+             'delocalize_low_memory': scenario_delocalize_low_memory,
+             'coverage_report': scenario_coverage_report,
+             'find_strings_to_localize': scenario_find_strings_to_localize,
+             'pretty_xml': scenario_pretty_xml}
+
+
+def io_sink():
+    """Stream for progress lines of ftl_localizer."""
+    return open(os.devnull, 'w', encoding='utf-8')
+
+
+def measure(function, outputdir, repeat):
+    """Runs function repeat times and once more under tracemalloc.
+    Output directory is emptied before each run, this is not timed.
+    Returns list of times and peak memory in bytes, memory allocated
+    by lxml itself is not counted.
+    """
+
+    def run():
+        """One run with clean output directory and no progress lines."""
+        shutil.rmtree(outputdir, ignore_errors=True)
+        with io_sink() as sink, contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            function()
+            return time.perf_counter() - start
+
+    times = [run() for _ in range(repeat)]
+    # Tracing slows down the run, so memory is measured separately
+    tracemalloc.start()
+    try:
+        run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak_memory
+
+
+def run_benchmarks(size=100, seed=0, repeat=3, engine='bs4', scenarios=None, workdir=None):
+    """Generates the corpus and runs scenarios.
+
+    :param size: Size of generated corpus, see generate_corpus().
+
+    :param seed: Seed of corpus generator.
+
+    :param repeat: Number of timed runs of each scenario.
+
+    :param engine: Engine passed to ftl_localizer functions.
+
+    :param scenarios: Names of scenarios to run, all by default.
+
+    :param workdir: Folder for corpus and outputs, temporary by default.
+
+    Returns report dictionary.
+    """
+    if scenarios is None:
+        scenarios = list(SCENARIOS)
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise Exception(f'Unknown scenario {name}')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = workdir if workdir is not None else temp_dir
+        corpus_dir = os.path.join(root, 'corpus')
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        files = generate_corpus(corpus_dir, size, seed)
+        corpus_bytes = sum(os.path.getsize(os.path.join(corpus_dir, filename))
+                           for filename in files)
+        results = []
+        for name in scenarios:
+            outputdir = os.path.join(root, 'output')
+            function = SCENARIOS[name](corpus_dir, outputdir, engine)
+            times, peak_memory = measure(function, outputdir, repeat)
+            results.append({'scenario': name, 'times': times, 'best': min(times),
+                            'mean': sum(times) / len(times), 'peak_memory': peak_memory})
+            print(f'{name}: best {min(times):.3f} s, peak memory {peak_memory / 2 ** 20:.1f} MB',
+                  file=sys.stderr)
+    return {'version': REPORT_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'engine': engine,
+            'corpus': {'size': size, 'seed': seed, 'files': len(files), 'bytes': corpus_bytes},
+            'repeat': repeat,
+            'results': results}
+
+
+def compare_reports(report, baseline, threshold):
+    """Returns (scenario, measure) pairs where best time or peak memory
+    is more than threshold times worse than in baseline report.
+    """
+    baseline_results = {result['scenario']: result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        previous = baseline_results.get(result['scenario'])
+        if previous is None:
+            continue
+        for measure_name in ('best', 'peak_memory'):
+            if result[measure_name] > previous[measure_name] * threshold:
+                regressions.append((result['scenario'], measure_name))
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Benchmarks of ftl_localizer.')
+    parser.add_argument('--size', type=int, default=100, help='number of top level events')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engine', default='bs4',
+                        choices=sorted(ftl_localizer.SUPPORTED_ENGINES))
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run, can be repeated, all by default')
+    parser.add_argument('--workdir', help='folder for corpus and outputs')
+    parser.add_argument('--output', help='report file, stdout by default')
+    parser.add_argument('--baseline', help='report to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='allowed slowdown or memory growth compared to baseline')
+    args = parser.parse_args(argv)
+    report = run_benchmarks(args.size, args.seed, args.repeat, args.engine,
+                            args.scenario, args.workdir)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline is not None:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare_reports(report, json.load(file), args.threshold)
+        for name, measure_name in regressions:
+            print(f'Regression in {name} ({measure_name})', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Microbenchmark of tag selection: find_all() with a condition
+function called for every tag against find_tags(), which lets lxml
+select tags by name in C. Both must give the same tags in the same
+order, the benchmark fails otherwise.
+
+Usage: python -m benchmarks.selection [--size 100] [--repeat 5] [--output report.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ftl_localizer
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import io_sink
+
+REPORT_VERSION = 1
+
+
+def need_to_delocalize(tag):
+    """Same condition as find_ids_to_delocalize() with continue ids."""
+    return (tag.name in ftl_localizer.ALL_TAGS) and (tag.string is None) and tag.has_attr('id')
+
+
+def is_text(tag):
+    """Condition which find_all('text') used to check for every tag."""
+    return tag.name == 'text'
+
+
+# Selection name: (condition for every tag, selection by names)
+SELECTIONS = {
+    'localize': (ftl_localizer.need_to_localize,
+                 lambda soup: ftl_localizer.find_tags(soup, ftl_localizer.ALL_TAGS,
+                                                      ftl_localizer.need_to_localize)),
+    'delocalize': (need_to_delocalize,
+                   lambda soup: ftl_localizer.find_tags(soup, ftl_localizer.ALL_TAGS,
+                                                        need_to_delocalize)),
+    'text': (is_text, lambda soup: soup.find_all('text')),
+}
+
+
+def best_time(function, repeat):
+    """Best of repeat runs in seconds."""
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if (result is None) or (elapsed < result):
+            result = elapsed
+    return result
+
+
+def run_select(size=100, seed=0, repeat=5, engines=None):
+    """Parses generated corpus and its localized version, times each
+    selection on all trees with both paths.
+    Returns report dictionary.
+    """
+    if engines is None:
+        engines = sorted(ftl_localizer.SUPPORTED_ENGINES)
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = os.path.join(temp_dir, 'corpus')
+        localized_dir = os.path.join(temp_dir, 'localized')
+        generate_corpus(corpus_dir, size, seed)
+        with io_sink() as sink, contextlib.redirect_stdout(sink):
+            ftl_localizer.localize(corpus_dir, localized_dir, 'ru')
+        for engine in engines:
+            soups = [ftl_localizer.parse_file(directory, filename, engine)
+                     for directory in (corpus_dir, localized_dir)
+                     for filename in ftl_localizer.list_xml_files(directory)]
+            for name, (condition, select) in SELECTIONS.items():
+                expected = [soup.find_all(condition) for soup in soups]
+                selected = [select(soup) for soup in soups]
+                if any((len(old) != len(new)) or any(a is not b for a, b in zip(old, new))
+                       for old, new in zip(expected, selected)):
+                    raise Exception(f'Selection {name} differs for {engine} engine')
+                predicate = best_time(lambda: [soup.find_all(condition) for soup in soups],
+                                      repeat)
+                by_names = best_time(lambda: [select(soup) for soup in soups], repeat)
+                results.append({'engine': engine, 'selection': name,
+                                'tags': sum(len(tags) for tags in selected),
+                                'predicate': predicate, 'by_names': by_names,
+                                'speedup': predicate / by_names})
+                print(f'{engine} {name}: predicate {predicate * 1000:.1f} ms, '
+                      f'by names {by_names * 1000:.1f} ms', file=sys.stderr)
+        shutil.rmtree(localized_dir, ignore_errors=True)
+    return {'version': REPORT_VERSION, 'corpus': {'size': size, 'seed': seed},
+            'repeat': repeat, 'results': results}
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Tag selection microbenchmark.')
+    parser.add_argument('--size', type=int, default=100, help='number of top level events')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--engine', action='append',
+                        choices=sorted(ftl_localizer.SUPPORTED_ENGINES),
+                        help='engine to test, can be repeated, all by default')
+    parser.add_argument('--output', help='report file, stdout by default')
+    args = parser.parse_args(argv)
+    report = run_select(args.size, args.seed, args.repeat, args.engine)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Memory of localize and delocalize dictionaries on a generated mod:
+dict of [name, source] lists and plain {id: string} dict they used
+to be against StringTable. Only memory of the dictionaries is
+measured, text strings and ids are shared by all of them.
+
+Usage: python -m benchmarks.string_table [--size 1000] [--output report.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ftl_localizer
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import io_sink
+
+REPORT_VERSION = 1
+
+
+def localize_lists(entries):
+    """Localize dictionary with a list for each string."""
+    result = {}
+    for string, name, source in entries:
+        result[string] = [name, source]
+    return result
+
+
+def localize_table(entries):
+    """Localize dictionary as StringTable."""
+    result = ftl_localizer.StringTable('text')
+    for string, name, source in entries:
+        result.add(string, name, source)
+    return result
+
+
+def delocalize_dict(entries):
+    """Delocalize dictionary as plain dict."""
+    result = {}
+    for string, name, _ in entries:
+        result[name] = string
+    return result
+
+
+def delocalize_table(entries):
+    """Delocalize dictionary as StringTable."""
+    result = ftl_localizer.StringTable('id')
+    for string, name, source in entries:
+        result.add(string, name, source)
+    return result
+
+
+# Dictionary name: (old layout, StringTable)
+LAYOUTS = {'localize': (localize_lists, localize_table),
+           'delocalize': (delocalize_dict, delocalize_table)}
+
+
+def measure(build, entries):
+    """Memory in bytes kept by the dictionary and time to build it."""
+    tracemalloc.start()
+    try:
+        dictionary = build(entries)
+        memory = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del dictionary
+    start = time.perf_counter()
+    build(entries)
+    return memory, time.perf_counter() - start
+
+
+def run_string_table(size=1000, seed=0):
+    """Makes localize dictionary of generated corpus and measures
+    both layouts of each dictionary with its entries.
+    Returns report dictionary.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = os.path.join(temp_dir, 'corpus')
+        generate_corpus(corpus_dir, size, seed)
+        with io_sink() as sink, contextlib.redirect_stdout(sink):
+            entries = list(ftl_localizer.localize_dictionary(corpus_dir).entries())
+    results = []
+    for name, (old_layout, new_layout) in LAYOUTS.items():
+        old_memory, old_time = measure(old_layout, entries)
+        new_memory, new_time = measure(new_layout, entries)
+        results.append({'dictionary': name, 'entries': len(entries),
+                        'old_memory': old_memory, 'table_memory': new_memory,
+                        'old_time': old_time, 'table_time': new_time})
+        print(f'{name}: {len(entries)} entries, old {old_memory / len(entries):.1f} bytes, '
+              f'table {new_memory / len(entries):.1f} bytes per entry', file=sys.stderr)
+    return {'version': REPORT_VERSION, 'corpus': {'size': size, 'seed': seed},
+            'results': results}
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='String table memory benchmark.')
+    parser.add_argument('--size', type=int, default=1000, help='number of top level events')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='report file, stdout by default')
+    args = parser.parse_args(argv)
+    report = run_string_table(args.size, args.seed)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
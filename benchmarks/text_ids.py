@@ -0,0 +1,184 @@
+"""Microbenchmark of id generation: the previous find_strings_to_localize(),
+which listed all parents of every localizable tag and walked previous
+siblings to number it and each of its choices, against the single pass
+with a stack of open tags. Both must give the same records for the same
+tags, the benchmark fails otherwise.
+
+The previous version is quadratic in the length of an eventList,
+so the default list is shorter than in benchmarks.run.
+
+Usage: python -m benchmarks.text_ids [--events 1000] [--repeat 3] [--output report.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+from lxml import etree
+
+import ftl_localizer
+from benchmarks.corpus import generate_event_list
+from benchmarks.run import io_sink
+from benchmarks.selection import best_time
+
+REPORT_VERSION = 1
+
+
+def parents(soup, tag):
+    """Ancestors of tag up to the document, as bs4 Tag.parents."""
+    if not isinstance(soup, ftl_localizer.LxmlDocument):
+        return list(tag.parents)
+    result = list(tag.iterancestors())
+    result.append(soup)
+    return result
+
+
+def previous_sibling(tag):
+    """Previous sibling, strings have no name and never matter
+    when counting siblings so lxml trees skip them.
+    """
+    if isinstance(tag, ftl_localizer.LxmlTag):
+        return next(tag.itersiblings(etree.Element, preceding=True), None)
+    return tag.previous_sibling
+
+
+def reference_textid(soup, tag):
+    """Previous get_textid(): ids from the list of parents."""
+
+    def get_sibling_number(_tag):
+        """Get order number of tag counting only
+        sibling tags with same name
+        """
+        _result = '1'
+        before = 0
+        prevtag = previous_sibling(_tag)
+        while prevtag is not None:
+            if prevtag.name == _tag.name:
+                before += 1
+            prevtag = previous_sibling(prevtag)
+        if before > 0:
+            _result = str(before + 1)
+        return _result
+
+    def get_child_str(_parents):
+        """Forms text ids from parent tags following structure
+        c1_c2_c1_c10...
+        """
+        _result = ''
+        for parent_tag in reversed(_parents[:-1]):
+            if parent_tag.name == 'choice':
+                _result = f'{_result}_c{get_sibling_number(parent_tag)}'
+        parent_str = ftl_localizer.PARENT_TAG_DICT.get(_parents[0].name, _parents[0].name)
+        return f'{_result}_{parent_str}'
+
+    def get_attr(_tag):
+        """Safer function to get attribute."""
+        if _tag.has_attr('name'):
+            return f'_{_tag["name"]}'
+        else:
+            return ''
+
+    result = None
+    parent_list = parents(soup, tag)
+    if len(parent_list) > 2:
+        parent_top = parent_list[-3]
+        if (tag.name == 'text') and not tag.has_attr('name'):
+            if parent_top.name == 'textList':
+                result = f'text{get_attr(parent_top)}_{get_sibling_number(tag)}'
+            elif parent_top.name == 'event':
+                result = f'event{get_attr(parent_top)}{get_child_str(parent_list[:-2])}'
+            elif parent_top.name == 'eventList':
+                result = f'event{get_attr(parent_top)}_' \
+                         f'{get_sibling_number(parent_list[-4])}' \
+                         f'{get_child_str(parent_list[:-3])}'
+            elif parent_top.name == 'ship':
+                result = f'ship{get_attr(parent_top)}_{parent_list[-4].name}' \
+                         f'{get_child_str(parent_list[:-3])}'
+        elif tag.name in ftl_localizer.BLUEPRINT_TAGS:
+            if parent_top.name[-9:] == 'Blueprint':
+                result = f'{parent_top.name[:-9]}{get_attr(parent_top)}_{tag.name}'
+        elif tag.name == 'name':
+            if parent_top.name == 'shipBlueprint':
+                result = f'{parent_top.name[:-9]}{get_attr(parent_top)}_{tag.name}'
+        elif tag.name == 'power':
+            if parent_top.name == 'crewBlueprint' and parent_list[0].name == 'powerList':
+                result = f'{parent_top.name[:-9]}{get_attr(parent_top)}_{tag.name}' \
+                         f'{get_sibling_number(tag)}'
+        elif tag.name == 'crewMember':
+            result = f'name_crewMember_{tag.string}'
+    return result
+
+
+def reference_find_strings(soup):
+    """Previous find_strings_to_localize(), same tags and records."""
+    tags = soup.find_all(ftl_localizer.need_to_localize)
+    positions = {id(tag): index for index, tag in enumerate(tags)}
+    records = []
+    for tag in tags:
+        nested_in = None
+        for parent in parents(soup, tag):
+            if id(parent) in positions:
+                nested_in = positions[id(parent)]
+                break
+        records.append((ftl_localizer.detach_string(tag.string),
+                        reference_textid(soup, tag), nested_in))
+    return tags, records
+
+
+def run_text_ids(events=1000, seed=0, repeat=3, engines=None):
+    """Parses generated event list, times id generation on it
+    with both versions.
+    Returns report dictionary.
+    """
+    if engines is None:
+        engines = sorted(ftl_localizer.SUPPORTED_ENGINES)
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        events_dir = os.path.join(temp_dir, 'events')
+        filename = generate_event_list(events_dir, events, seed)
+        for engine in engines:
+            with io_sink() as sink, contextlib.redirect_stdout(sink):
+                soup = ftl_localizer.parse_file(events_dir, filename, engine)
+            old_tags, old_records = reference_find_strings(soup)
+            tags, records = ftl_localizer.find_strings_to_localize(soup)
+            if (len(old_tags) != len(tags)) or any(a is not b for a, b in zip(old_tags, tags)) \
+                    or (old_records != records):
+                raise Exception(f'Text ids differ for {engine} engine')
+            parents_time = best_time(lambda: reference_find_strings(soup), repeat)
+            stack_time = best_time(lambda: ftl_localizer.find_strings_to_localize(soup), repeat)
+            results.append({'engine': engine, 'strings': len(records),
+                            'parents': parents_time, 'stack': stack_time,
+                            'speedup': parents_time / stack_time})
+            print(f'{engine}: parents {parents_time * 1000:.1f} ms, '
+                  f'stack {stack_time * 1000:.1f} ms', file=sys.stderr)
+            ftl_localizer.release_tree(soup)
+    return {'version': REPORT_VERSION, 'events': {'count': events, 'seed': seed},
+            'repeat': repeat, 'results': results}
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Text id generation microbenchmark.')
+    parser.add_argument('--events', type=int, default=1000, help='number of events in the list')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engine', action='append',
+                        choices=sorted(ftl_localizer.SUPPORTED_ENGINES),
+                        help='engine to test, can be repeated, all by default')
+    parser.add_argument('--output', help='report file, stdout by default')
+    args = parser.parse_args(argv)
+    report = run_text_ids(args.events, args.seed, args.repeat, args.engine)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,10 +3,13 @@
     all text strings from data files into separate text files which
     can be different for each language.
 
-    :param workdir: Work directory where all input xml files are located.
+    :param workdir: Work directory where all input xml files are located,
+        or .ftl/.zip mod archive which is read without extracting.
 
     :param outputdir: Creates a folder with this name
-        and puts all result files there.
+        and puts all result files there. If it ends with .ftl or .zip,
+        a mod archive is made instead: with result files in data folder
+        and other files of the mod copied as they are.
 
     :param language_attr: Determines xml attribute "language"
         in result localization file.
@@ -19,15 +22,63 @@
         combined, otherwise, files will be split into categories based
         on source file.
 
+    :param engine: 'bs4' parses files with BeautifulSoup, 'lxml' uses
+        lighter and faster lxml trees, result is the same.
+
+    :param workers: Number of processes used to parse and write files,
+        result is the same as with one process. When workers > 1,
+        call functions under if __name__ == '__main__': on Windows.
+
+    :param incremental: If True, keeps a manifest in output folder and
+        next time processes only changed files. Result is the same as
+        full run.
+
+    :param force_rebuild: If True, incremental run ignores previous
+        manifest and processes all files.
+
+    :param split_files: List of (result file name, source) pairs for
+        split_result. Strings go to the first file whose source is a part
+        of their source file name, None matches any file.
+
+    :param index_file: If set, also saves strings of result text files
+        to this index file for delocalize function.
+
+    :param instrument: Gets structured events with time of each phase
+        and file, sizes of files and counters of strings: a function,
+        logging.Logger or path of JSON lines file.
+
+    :param profile_file: If set, saves cProfile stats of the run
+        to this file.
+
+    :param low_memory: If True, files are not kept in memory after
+        they are read, only one file at a time is loaded. Slower,
+        but much less memory is needed for big mods.
+
+    :param writer_threads: Number of threads which write result files
+        while next ones are prepared, 0 writes them right away. Files
+        are replaced only when they are complete, so a failed run
+        leaves no half-written files.
+
+    :param fsync: If True, each result file is flushed to disk
+        before it replaces the previous one.
+
+    :param baseline_index: Index of vanilla text files made by build_index
+        or batch. With check_same_strings, strings which are already
+        there keep their vanilla ids and are not written again.
+        Without check_same_strings the index is not read.
+
 
     delocalize function: Makes xml files more convenient to edit by
     inserting text strings from separate text files directly into
     data files.
 
-    :param workdir: Work directory where all input xml files are located.
+    :param workdir: Work directory where all input xml files are located,
+        or .ftl/.zip mod archive which is read without extracting.
 
     :param outputdir: Creates a folder with this name
-        and puts all result files there.
+        and puts all result files there. If it ends with .ftl or .zip,
+        a mod archive is made instead: with result files in data folder
+        and other files of the mod copied as they are.
 
     :param language_attr: Determines xml attribute "language" which will
         be searched in text files for insertion into data files.
@@ -39,14 +90,145 @@
     :param ignore_continue: If True, do not replace continue id
         with Continue... text.
 
+    :param engine: 'bs4' or 'lxml', same as in localize function.
+
+    :param workers: Number of processes, same as in localize function.
+
+    :param incremental: Same as in localize function.
+
+    :param force_rebuild: Same as in localize function.
+
+    :param index_file: Index file made by localize or build_index
+        functions, used instead of collecting strings from text files.
+
+    :param instrument: Same as in localize function.
+
+    :param profile_file: Same as in localize function.
+
+    :param low_memory: Same as in localize function.
+
+    :param writer_threads: Same as in localize function.
+
+    :param fsync: Same as in localize function.
+
+    :param baseline_index: Index of vanilla text files made by build_index
+        or batch, ids which are not defined in workdir are looked up there.
+
+
+    localize_all and delocalize_all functions: Same as localize and
+    delocalize but files are parsed once for all languages.
+    localize_all writes text-<language>.xml for each language,
+    delocalize_all writes data files of each language into a subfolder
+    of outputdir named after the language and returns numbers
+    of missing strings.
+
+    :param languages: List of languages, all supported by default.
+
+
+    build_index function: Saves strings of text files from workdir
+    to index_file which can be shared and used by delocalize.
+
+
+    delta function: Writes only text strings which were added or changed
+    in a new version of the mod, text-<language>.xml.append for each
+    language, and returns lists of added, changed and removed ids.
+
+    :param old_workdir: Previous version: work directory, mod archive or
+        manifest file left by incremental localize in its output folder.
+
+    :param workdir: New version: work directory or mod archive.
+
+    Other parameters are the same as in localize_all function.
+
+
+    watch function: Runs localize or delocalize and keeps outputdir
+    up to date while files in workdir are edited, only changed files
+    are read again. Stops on Ctrl+C.
+
+    :param mode: 'localize' or 'delocalize'.
+
+    :param interval: Seconds between checks of workdir.
+
+    :param stop_event: threading.Event which stops watching when set.
+
+    :param on_update: Function called with list of changed files
+        after each update.
+
+    Other parameters are the same as in localize or delocalize function.
+
+
+    batch function: Runs localize or delocalize for every mod found in root
+    folder and its subfolders: folders with xml files and .ftl/.zip
+    archives. Result of each mod goes to the same path in outputdir.
+    Returns summaries of mods: status, time, written files and strings.
+    Strings of baseline are counted apart from strings of the mod.
+
+    :param mode: 'localize' or 'delocalize'.
+
+    :param baseline: Folder with vanilla xml files. Their strings are
+        read once and saved to a cached index used for all mods.
+
+    :param cache_dir: Folder of cached indexes, inside outputdir by default.
+
+    :param include: Glob patterns of mod paths to run, like 'mods/*'.
+
+    :param exclude: Glob patterns of paths to skip, like 'drafts'.
+
+    :param workers: Number of mods processed at the same time.
+
+    :param summary_file: If set, saves summaries to this JSON file.
+
+    Other parameters are the same as in localize or delocalize function.
+
+
+    coverage_report function: Checks strings of all languages without
+    writing data files and returns a report: coverage, missing and
+    orphaned ids of each language, duplicate definitions with their
+    files and ids used in data files but not defined anywhere.
+
+    :param report_file: If set, saves the report to this file.
+
+    :param report_format: 'json' or 'csv', by default csv for .csv files.
+
+    :param baseline_index: Index of vanilla text files, its strings
+        count as defined.
+
+    Other parameters are the same as in delocalize function.
+
+
+    ParseCache class: Opt-in cache of parsed files for repeated runs,
+    keyed by file contents and engine, with entries in cache_dir and
+    recently used ones in memory. Runs in "with ParseCache(cache_dir):"
+    block parse only files which they write, cache.stats() returns
+    numbers of hits and misses. Cache is cleared when the tool changes.
+
+    :param cache_dir: Folder of cache files.
+
+    :param memory_limit: Bytes of entries kept in memory, 64 MB by default.
+
+
+    localize_files and delocalize_files functions: Same as localize and
+    delocalize but files are given and returned in memory, for services
+    which process several requests at once in threads. Return
+    ({filename: bytes} of result files, statistics: time, written files
+    and strings).
+
+    :param files: {filename: bytes} of xml files.
+
+    Other parameters are the same as in localize or delocalize function,
+    except incremental and workers.
+
 Инструкция:
     localize: Подготовить файлы для локализации, скопировав все строки
     из файлов с данными (события, орудия) в отдельные файлы текстов,
     которые могут отличаться для разных языков.
 
-    :param workdir: Рабочая директория (там где расположены исходные файлы).
+    :param workdir: Рабочая директория (там где расположены исходные файлы),
+        или архив мода .ftl/.zip, который читается без распаковки.
 
     :param outputdir: Выходная директория (куда скопировать результат).
+        Если заканчивается на .ftl или .zip, создается архив мода:
+        результат в папке data, остальные файлы мода копируются как есть.
 
     :param language_attr: Атрибут "language", который будет использоваться
         в выходных файлах.
@@ -60,13 +242,63 @@
         в один, иначе, файлы будут разбиты по категориям.
         (events, blueprints, misc...)
 
+    :param engine: 'bs4' - разбирать файлы с помощью BeautifulSoup,
+        'lxml' - использовать более легкие и быстрые деревья lxml,
+        результат одинаковый.
+
+    :param workers: Количество процессов для разбора и записи файлов,
+        результат такой же, как с одним процессом. Если workers > 1,
+        на Windows функции нужно вызывать внутри
+        if __name__ == '__main__':
+
+    :param incremental: Если True, сохранить манифест в выходной
+        директории и в следующий раз обрабатывать только измененные
+        файлы. Результат такой же, как при полной обработке.
+
+    :param force_rebuild: Если True, не использовать сохраненный
+        манифест и обработать все файлы заново.
+
+    :param split_files: Список пар (имя файла результата, источник) для
+        split_result. Строка попадает в первый файл, чей источник является
+        частью имени ее исходного файла, None подходит любому файлу.
+
+    :param index_file: Если задан, сохранить строки файлов текстов
+        в этот индекс для функции delocalize.
+
+    :param instrument: Получает события с временем каждого этапа и файла,
+        размерами файлов и количеством строк: функция, logging.Logger
+        или путь к файлу JSON lines.
+
+    :param profile_file: Если задан, сохранить статистику cProfile
+        в этот файл.
+
+    :param low_memory: Если True, не держать прочитанные файлы в памяти,
+        одновременно загружен только один файл. Медленнее, но для больших
+        модов нужно гораздо меньше памяти.
+
+    :param writer_threads: Количество потоков, которые записывают готовые
+        файлы, пока обрабатываются следующие, при 0 файлы записываются
+        сразу. Файл заменяется только когда он записан полностью, поэтому
+        после ошибки не остается недописанных файлов.
+
+    :param fsync: Если True, каждый файл сбрасывается на диск
+        перед тем, как заменить предыдущий.
+
+    :param baseline_index: Индекс файлов текстов оригинальной игры,
+        созданный build_index или batch. При check_same_strings строки,
+        которые уже есть в нем, получают оригинальные id и не записываются
+        повторно. Без check_same_strings индекс не читается.
+
 
     delocalize: Для удобства редактирования, переместить все строки из
     отдельных файлов с текстами в файлы с данными (события, орудия).
 
-    :param workdir: Рабочая директория (там где расположены исходные файлы).
+    :param workdir: Рабочая директория (там где расположены исходные файлы),
+        или архив мода .ftl/.zip, который читается без распаковки.
 
     :param outputdir: Выходная директория (куда скопировать результат).
+        Если заканчивается на .ftl или .zip, создается архив мода:
+        результат в папке data, остальные файлы мода копируются как есть.
 
     :param language_attr: Значение атрибута "language" для поиска в текстовых
         файлах. ('de', 'es', 'fr', 'it', 'pl', 'pt', 'ru', 'zh-Hans').
@@ -78,6 +310,139 @@
     :param ignore_continue: Если True, не заменять "continue" текстом
         Продолжить...
 
+    :param engine: 'bs4' или 'lxml', так же как в функции localize.
+
+    :param workers: Количество процессов, так же как в функции localize.
+
+    :param incremental: Так же как в функции localize.
+
+    :param force_rebuild: Так же как в функции localize.
+
+    :param index_file: Индекс, созданный localize или build_index,
+        используется вместо сбора строк из файлов текстов.
+
+    :param instrument: Так же как в функции localize.
+
+    :param profile_file: Так же как в функции localize.
+
+    :param low_memory: Так же как в функции localize.
+
+    :param writer_threads: Так же как в функции localize.
+
+    :param fsync: Так же как в функции localize.
+
+    :param baseline_index: Индекс файлов текстов оригинальной игры,
+        созданный build_index или batch, в нем ищутся id, которые
+        не заданы в workdir.
+
+
+    localize_all и delocalize_all: Так же как localize и delocalize,
+    но файлы читаются один раз для всех языков.
+    localize_all создает text-<язык>.xml для каждого языка,
+    delocalize_all записывает файлы данных каждого языка в подпапку
+    outputdir с названием языка и возвращает количество
+    ненайденных строк.
+
+    :param languages: Список языков, по умолчанию все поддерживаемые.
+
+
+    build_index: Сохранить строки файлов текстов из workdir в индекс
+    index_file, который можно передавать и использовать в delocalize.
+
+
+    delta: Записать только строки, которые добавлены или изменены в новой
+    версии мода, в text-<язык>.xml.append для каждого языка, и вернуть
+    списки добавленных, измененных и удаленных id.
+
+    :param old_workdir: Предыдущая версия: рабочая директория, архив мода
+        или файл манифеста, который incremental localize оставляет
+        в выходной директории.
+
+    :param workdir: Новая версия: рабочая директория или архив мода.
+
+    Остальные параметры так же как в функции localize_all.
+
+
+    watch: Запустить localize или delocalize и обновлять outputdir
+    при изменении файлов в workdir, заново читаются только измененные
+    файлы. Остановить можно нажав Ctrl+C.
+
+    :param mode: 'localize' или 'delocalize'.
+
+    :param interval: Пауза в секундах между проверками workdir.
+
+    :param stop_event: threading.Event, наблюдение прекращается,
+        когда он установлен.
+
+    :param on_update: Функция, которая получает список измененных
+        файлов после каждого обновления.
+
+    Остальные параметры так же как в функции localize или delocalize.
+
+
+    batch: Запустить localize или delocalize для каждого мода в папке root
+    и ее подпапках: папок с xml файлами и архивов .ftl/.zip. Результат
+    каждого мода записывается по тому же пути в outputdir. Возвращает
+    сводку по модам: статус, время, записанные файлы и строки.
+    Строки baseline считаются отдельно от строк мода.
+
+    :param mode: 'localize' или 'delocalize'.
+
+    :param baseline: Папка с xml файлами оригинальной игры. Их строки
+        читаются один раз и сохраняются в кэш-индекс для всех модов.
+
+    :param cache_dir: Папка для кэша индексов, по умолчанию внутри outputdir.
+
+    :param include: Шаблоны путей модов, которые нужно обработать,
+        например 'mods/*'.
+
+    :param exclude: Шаблоны путей, которые нужно пропустить,
+        например 'drafts'.
+
+    :param workers: Количество модов, обрабатываемых одновременно.
+
+    :param summary_file: Если задан, сохранить сводку в этот JSON файл.
+
+    Остальные параметры так же как в функции localize или delocalize.
+
+
+    coverage_report: Проверить строки всех языков, не записывая файлы
+    данных, и вернуть отчет: покрытие, недостающие и лишние id каждого
+    языка, повторные определения с их файлами и id, которые
+    используются в файлах данных, но нигде не определены.
+
+    :param report_file: Если задан, сохранить отчет в этот файл.
+
+    :param report_format: 'json' или 'csv', по умолчанию csv для файлов .csv.
+
+    :param baseline_index: Индекс файлов текстов оригинальной игры,
+        его строки считаются определенными.
+
+    Остальные параметры так же как в функции delocalize.
+
+
+    ParseCache: Кэш прочитанных файлов для повторных запусков, по
+    содержимому файла и engine, записи хранятся в cache_dir, недавние
+    также в памяти. Запуски внутри блока "with ParseCache(cache_dir):"
+    читают только те файлы, которые записывают, cache.stats() возвращает
+    количество попаданий и промахов. Кэш очищается при изменении программы.
+
+    :param cache_dir: Папка для файлов кэша.
+
+    :param memory_limit: Байт записей в памяти, по умолчанию 64 МБ.
+
+
+    localize_files и delocalize_files: То же, что localize и delocalize,
+    но файлы передаются и возвращаются в памяти, для сервисов, которые
+    обрабатывают несколько запросов одновременно в потоках. Возвращают
+    ({имя файла: bytes} результата, статистика: время, записанные файлы
+    и строки).
+
+    :param files: {имя файла: bytes} xml файлов.
+
+    Остальные параметры так же как в функции localize или delocalize,
+    кроме incremental и workers.
+
     Don't forget to put double \\ for Windows paths
     Не забудьте поставить двойные \\ в путях на Windows
 """
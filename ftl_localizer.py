@@ -2,13 +2,38 @@
 by copying all strings into one file or vice versa.
 """
 
+import array
+import contextlib
+import contextvars
+import cProfile
+import csv
+import fnmatch
+import hashlib
+import io
+import itertools
+import json
+import logging
+import mmap
 import os
+import queue
 import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 
+import bs4
 from bs4 import BeautifulSoup
+from bs4.element import Comment, Doctype, PreformattedString, Tag, XMLProcessingInstruction
+from lxml import etree
 
-EMPTY_XML = '<?xml version="1.0" encoding="utf-8"?> \
-<!-- Copyright (c) 2012 by Subset Games. All rights reserved --><FTL></FTL>'
+COPYRIGHT_COMMENT = '<!-- Copyright (c) 2012 by Subset Games. All rights reserved -->'
 
 SUPPORTED_LANGUAGES = {'de', 'es', 'fr', 'it', 'pl', 'pt', 'ru', 'zh-Hans'}
 
@@ -18,6 +43,96 @@ ALL_TAGS = {'text', 'class', 'desc', 'title', 'short', 'tooltip',
 BLUEPRINT_TAGS = {'class', 'desc', 'title', 'short', 'tooltip',
                   'unlock', 'flavorType'}
 
+SUPPORTED_ENGINES = {'bs4', 'lxml'}
+
+# Patterns searched in file contents before parsing, they may match
+# more than the parser finds but never less: opening tag from ALL_TAGS
+# with optional namespace prefix, same tag which is certainly closed
+# right away, text tag, id attribute, and DTD whose entities can add
+# tags to the tree
+PRESCAN_TAG = re.compile(r'<(?:[^\s<>/]*:)?(?:%s)(?![\w.\-])' % '|'.join(sorted(ALL_TAGS)))
+PRESCAN_EMPTY_TAG = re.compile(r'<(?:[^\s<>/]*:)?(?:%s)(?:\s+[\w.\-:]+\s*=\s*'
+                               r'(?:"[^"<>]*"|\'[^\'<>]*\'))*\s*/>' % '|'.join(sorted(ALL_TAGS)))
+PRESCAN_TEXT_TAG = re.compile(r'<(?:[^\s<>/]*:)?text(?![\w.\-])')
+PRESCAN_ID_ATTR = re.compile(r'(?<![\w.\-])id\s*=')
+PRESCAN_DTD = re.compile(r'<!(?:DOCTYPE|ENTITY)', re.IGNORECASE)
+
+# Tag with namespace prefix, lxml keeps undeclared prefixes in tag names
+# and such tags can't be selected by name
+PREFIXED_TAG = re.compile(r'<[^\s<>/!?]+:')
+
+# Document type declaration with internal subset, see parse_file()
+INTERNAL_DTD = re.compile(r'<!DOCTYPE[^>\[]*\[')
+
+# Namespace of xml: attributes, it is never declared in documents
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+
+# Python versions whose zipfile internals copy_archive_member() uses
+RAW_COPY_VERSIONS = ((3, 7), (3, 13))
+
+# Mod archives which can be used instead of work and output directories
+ARCHIVE_EXTENSIONS = ('.ftl', '.zip')
+
+# Folder of xml files in mod archive
+ARCHIVE_DATA_DIR = 'data/'
+
+# Functions that can be run by watch() and batch()
+WATCH_MODES = {'localize', 'delocalize'}
+
+# Formats of coverage_report() files
+REPORT_FORMATS = {'json', 'csv'}
+
+# Source of baseline strings in localize dictionary, they are not
+# written to result text files
+BASELINE_SOURCE = '<baseline>'
+
+# Baseline indexes made by batch() are kept in this folder
+# of output directory unless other cache folder is set
+BASELINE_CACHE_DIR = '.ftl_localizer_cache'
+
+# Whitespace that BeautifulSoup collapses in whitespace-only strings
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+# BeautifulSoup feeds lxml in chunks of this size
+LXML_CHUNK_SIZE = 512
+
+# Incremental runs keep this file in output directory
+MANIFEST_FILE = '.ftl_localizer_manifest.json'
+
+# Manifests of other versions are ignored
+MANIFEST_VERSION = 1
+
+# Format of parse cache entries and the file in cache folder
+# with version of the tool which made them
+PARSE_CACHE_VERSION = 1
+PARSE_CACHE_VERSION_FILE = 'version'
+
+# String index file: header with magic, number of languages, number
+# of source files and offset of string data, then a record for each
+# language and source file, and sorted entries of each language.
+# Little-endian, so it can be shared between machines.
+INDEX_MAGIC = b'FTLIDX01'
+INDEX_HEADER = struct.Struct('<8sIII')
+# Offset and length of language name, offset and number of entries
+INDEX_LANGUAGE = struct.Struct('<IIII')
+# Offset and length of file name, SHA-256 of the file, number of text ids
+# to delocalize with and without continue ids
+INDEX_SOURCE = struct.Struct('<II32sII')
+# Offset and length of id, offset and length of string, string type
+INDEX_ENTRY = struct.Struct('<IIIIB')
+INDEX_STRING_TYPES = (str, Comment, XMLProcessingInstruction)
+
+# Result files of split localize and substrings of source file names
+# whose strings go there. Each string goes to the first matching file,
+# None matches any source.
+SPLIT_RESULT_FILES = (('text_events.xml.append', 'event'),
+                      ('text_blueprints.xml.append', 'blueprint'),
+                      ('text_achievements.xml.append', 'achievement'),
+                      ('text_sectorname.xml.append', 'sector'),
+                      ('text_tooltips.xml.append', 'tooltip'),
+                      ('text_tutorial.xml.append', 'tutorial'),
+                      ('text_misc.xml.append', None))
+
 PARENT_TAG_DICT = {'event': 'text',
                    'destroyed': 'text',
                    'deadCrew': 'text',
@@ -33,87 +148,1947 @@ def check_dir(directory):
         raise Exception('Directory not found')
 
 
-def check_and_create_dir(directory):
-    """Checks if directory exists, and creates it if not."""
-    if os.path.exists(directory):
-        if not os.path.isdir(directory):
-            raise Exception('Directory is a file')
-    else:
-        os.mkdir(directory)
+def check_workdir(workdir):
+    """Checks if work directory or mod archive exists."""
+    if in_memory(workdir):
+        return
+    if is_archive(workdir):
+        if not zipfile.is_zipfile(workdir):
+            raise Exception('Archive not found')
+    else:
+        check_dir(workdir)
+
+
+def check_and_create_dir(directory):
+    """Checks if directory exists, and creates it if not."""
+    if os.path.exists(directory):
+        if not os.path.isdir(directory):
+            raise Exception('Directory is a file')
+    else:
+        os.mkdir(directory)
+
+
+def check_incremental_output(outputdir):
+    """Checks that manifest of incremental run can be kept in output directory."""
+    if is_archive(outputdir):
+        raise Exception('Incremental run needs output directory, not archive')
+    if in_memory(outputdir):
+        raise Exception('Incremental run needs output directory, not files in memory')
+
+
+def check_workers(outputdir, workers):
+    """Checks that result files in memory are not written by worker processes."""
+    if in_memory(outputdir) and (workers > 1):
+        raise Exception('Result files in memory are written by one worker')
+
+
+def check_engine(engine):
+    """Checks if parse engine is supported."""
+    if engine not in SUPPORTED_ENGINES:
+        raise Exception('Engine not supported')
+
+
+def check_split_files(split_files):
+    """Checks that every string has a result file to go to."""
+    if not any(source is None for _, source in split_files):
+        raise Exception('Split result files have no file for other strings')
+
+
+def check_language(lang):
+    """Checks if language is supported by FTL."""
+    result = None
+    if lang in SUPPORTED_LANGUAGES:
+        result = lang
+    return result
+
+
+def normalize_space(string):
+    """Collapses a string made only of ASCII whitespace into a single
+    space or newline, the same way BeautifulSoup does while parsing.
+    """
+    if string.strip(ASCII_SPACES) == '':
+        if '\n' in string:
+            return '\n'
+        return ' '
+    return string
+
+
+def local_name(name):
+    """Strips namespace or undeclared prefix from tag or attribute name,
+    lxml-xml builder of BeautifulSoup receives names without them.
+    """
+    if name[0] == '{':
+        return name.split('}', 1)[1]
+    return name.partition(':')[2] or name
+
+
+def escape_xml(string):
+    """Replaces special XML characters like bs4 "minimal" formatter."""
+    return string.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def quote_attr(value):
+    """Quotes attribute value like bs4 "minimal" formatter."""
+    value = escape_xml(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def lxml_node_string(node):
+    """Converts lxml comment or processing instruction into
+    matching bs4 string class.
+    """
+    if isinstance(node, etree._Comment):
+        return Comment(normalize_space(node.text or ''))
+    if isinstance(node, etree._ProcessingInstruction):
+        return XMLProcessingInstruction(f'{node.target} {node.text or ""}')
+    return None
+
+
+class LxmlTag(etree.ElementBase):
+    """lxml element which provides the part of bs4 Tag interface
+    used by localize() and delocalize().
+    Names and strings look exactly like bs4 would see them.
+    """
+
+    @property
+    def name(self):
+        """Tag name without namespace prefix."""
+        return local_name(self.tag)
+
+    @property
+    def attrs(self):
+        """Attributes with names as seen by bs4."""
+        return {local_name(key): value for key, value in self.attrib.items()}
+
+    def attr_keys(self, key):
+        """Actual lxml attribute names matching bs4 attribute name."""
+        return [_key for _key in self.attrib.keys() if local_name(_key) == key]
+
+    def has_attr(self, key):
+        """Same as bs4 Tag.has_attr() without building attrs dictionary."""
+        return (key in self.attrib) or any(local_name(_key) == key for _key in self.attrib.keys())
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.attrs[key]
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, str):
+            keys = self.attr_keys(key)
+            self.set(keys[-1] if keys else key, value)
+        else:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if isinstance(key, str):
+            for _key in self.attr_keys(key):
+                del self.attrib[_key]
+        else:
+            super().__delitem__(key)
+
+    @property
+    def contents(self):
+        """Child tags and strings in bs4 order."""
+        result = []
+        if self.text is not None:
+            result.append(normalize_space(self.text))
+        for child in self:
+            if isinstance(child, LxmlTag):
+                result.append(child)
+            else:
+                node_string = lxml_node_string(child)
+                if node_string is not None:
+                    result.append(node_string)
+            if child.tail is not None:
+                result.append(normalize_space(child.tail))
+        return result
+
+    def clear(self):
+        """Removes all contents but keeps attributes, same as bs4 Tag.clear()."""
+        self.text = None
+        for child in list(self):
+            self.remove(child)
+
+    @property
+    def string(self):
+        """Same as bs4 Tag.string."""
+        if len(self) == 0:
+            # Only text, most tags with strings look like this
+            return normalize_space(self.text) if self.text is not None else None
+        contents = self.contents
+        if len(contents) != 1:
+            return None
+        if isinstance(contents[0], LxmlTag):
+            return contents[0].string
+        return contents[0]
+
+    @string.setter
+    def string(self, string):
+        self.clear()
+        if isinstance(string, Comment):
+            self.append(etree.Comment(str(string)))
+        elif isinstance(string, XMLProcessingInstruction):
+            target, _, text = str(string).partition(' ')
+            self.append(etree.ProcessingInstruction(target, text))
+        else:
+            self.text = str(string)
+
+
+class LxmlDocument:
+    """Parsed lxml tree which provides the part of BeautifulSoup
+    interface used by localize() and delocalize().
+    """
+
+    name = '[document]'
+
+    def __init__(self, tree, prefixed=True, doctype=None):
+        self.tree = tree
+        # Tags may have undeclared prefixes, see find_tags()
+        self.prefixed = prefixed
+        # (line, bs4 Doctype) of document type declaration
+        self.doctype = doctype
+
+    def find_tags(self, names):
+        """Tags with one of names in document order. lxml selects them
+        in C unless some tags can have undeclared prefixes.
+        """
+        root = self.tree.getroot()
+        if self.prefixed:
+            return [tag for tag in root.iter(etree.Element) if tag.name in names]
+        return list(root.iter(*[f'{{*}}{name}' for name in names]))
+
+    def find_all(self, name):
+        """Find tags in document order by name or by condition function."""
+        if not callable(name):
+            return self.find_tags({name})
+        return [tag for tag in self.tree.getroot().iter(etree.Element) if name(tag)]
+
+
+def parse_lxml(contents):
+    """Parse xml string into lxml tree the same way
+    BeautifulSoup lxml-xml builder does.
+    """
+    if contents[:1] == '\ufeff':
+        contents = contents[1:]
+    parser = etree.XMLParser(recover=True)
+    parser.set_element_class_lookup(etree.ElementDefaultClassLookup(element=LxmlTag))
+    for start in range(0, len(contents), LXML_CHUNK_SIZE):
+        parser.feed(contents[start:start + LXML_CHUNK_SIZE])
+    tree = parser.close().getroottree()
+    doctype = None
+    if tree.docinfo.doctype:
+        line = contents.count('\n', 0, contents.find('<!DOCTYPE')) + 1
+        doctype = line, Doctype.for_name_and_ids(tree.docinfo.root_name, tree.docinfo.public_id,
+                                                 tree.docinfo.system_url)
+    return LxmlDocument(tree, PREFIXED_TAG.search(contents) is not None, doctype)
+
+
+def fix_formatting(string):
+    """Fixes prettified XML formatting to match the one used in FTL.
+    Used for comments and processing instructions only, as their
+    contents can be anything, tags and strings are already written
+    in FTL formatting.
+    """
+    # regex: remove first space in each line
+    string = re.sub(r'\n ', '\n', string)
+    # regex : remove newline and indent if this line is a tag but next line is not
+    string = re.sub(r'(?<=>)\n *(?! *<)', '', string)
+    # regex : remove newline and indent if this line is not a tag but next line is
+    string = re.sub(r'(?<!>)\n *(?=</)', '', string)
+    # regex: replace spaces with tabs before opening bracket <
+    string = re.sub(r'(?<=\s) (?= *<)', '\t', string)
+    return string
+
+
+def format_tag(name, attrs):
+    """Opening tag with attributes sorted like bs4 does.
+    Returns tag without closing bracket.
+    """
+    result = f'<{name}'
+    for key in sorted(attrs):
+        result = f'{result} {key}={quote_attr(attrs[key])}'
+    return result.replace('\n ', '\n')
+
+
+def format_string(string):
+    """Stripped string ready to be written between tags."""
+    if isinstance(string, PreformattedString):
+        return fix_formatting(f'{string.PREFIX}{string}{string.SUFFIX}'.strip())
+    return escape_xml(string).strip().replace('\n ', '\n')
+
+
+def lxml_attrs(tag):
+    """Attributes of lxml tag with names bs4 would use,
+    including namespace declarations.
+    """
+    attrs = {}
+    for key, value in tag.attrib.items():
+        if key[0] == '{':
+            namespace, key = key[1:].split('}', 1)
+            if namespace == XML_NAMESPACE:
+                key = f'xml:{key}'
+            else:
+                for prefix, uri in tag.nsmap.items():
+                    if uri == namespace and prefix:
+                        key = f'{prefix}:{key}'
+                        break
+        else:
+            key = local_name(key)
+        attrs[key] = value
+    parent = tag.getparent()
+    parent_nsmap = {} if parent is None else parent.nsmap
+    for prefix, uri in tag.nsmap.items():
+        if parent_nsmap.get(prefix) != uri:
+            attrs[f'xmlns:{prefix}' if prefix else 'xmlns'] = uri
+    return attrs
+
+
+def iter_pieces(soup):
+    """Walks bs4 or lxml tree and yields (piece, level) pairs:
+    tags and stripped strings with their indent level,
+    empty strings are skipped.
+    """
+    if isinstance(soup, LxmlDocument):
+        root = soup.tree.getroot()
+        top = [lxml_node_string(node) for node in root.itersiblings(preceding=True)]
+        top.reverse()
+        if soup.doctype is not None:
+            line, doctype = soup.doctype
+            before = sum(1 for node in root.itersiblings(preceding=True)
+                         if node.sourceline < line)
+            top.insert(before, doctype)
+        top.append(root)
+        top.extend(lxml_node_string(node) for node in root.itersiblings())
+        top = [item for item in top if item is not None]
+    else:
+        top = soup.contents
+    # Stack of (iterator over contents, closing tag) for each open tag
+    stack = [(iter(top), None)]
+    while stack:
+        item = next(stack[-1][0], None)
+        if item is None:
+            closing_tag = stack.pop()[1]
+            if closing_tag is not None:
+                yield closing_tag, len(stack) - 1
+            continue
+        if isinstance(item, str):
+            piece = format_string(item)
+            if piece:
+                yield piece, len(stack) - 1
+            continue
+        if isinstance(item, LxmlTag):
+            name = item.name
+            if item.prefix:
+                name = f'{item.prefix}:{name}'
+            attrs = lxml_attrs(item)
+        else:
+            name = item.name
+            if item.prefix:
+                name = f'{item.prefix}:{name}'
+            attrs = {str(key): value for key, value in item.attrs.items()}
+        contents = item.contents
+        if not contents:
+            yield f'{format_tag(name, attrs)}/>', len(stack) - 1
+            continue
+        yield f'{format_tag(name, attrs)}>', len(stack) - 1
+        stack.append((iter(contents), f'</{name}>'))
+
+
+def iter_locale_pieces(entries, lang):
+    """Yields pieces of a text file with (string, name) entries
+    the same way iter_pieces() does for its tree.
+    """
+    yield COPYRIGHT_COMMENT, 0
+    if not entries:
+        yield '<FTL/>', 0
+        return
+    yield '<FTL>', 0
+    for string, name in entries:
+        attrs = {'name': name}
+        if lang is not None:
+            attrs['language'] = lang
+        yield f"{format_tag('text', attrs)}>", 1
+        piece = format_string(string)
+        if piece:
+            yield piece, 2
+        yield '</text>', 1
+    yield '</FTL>', 0
+
+
+def write_pieces(pieces, file):
+    """Writes (piece, level) pairs to a file or any object with write method
+    using XML formatting of FTL: tab indents, strings are on the same
+    line with their tags. Top level tags are not indented.
+    """
+    previous = '<?xml version="1.0" encoding="utf-8"?>'
+    file.write(previous)
+    for piece, level in pieces:
+        if piece[0] == '<' and piece[1] == '/' and previous[-1] != '>':
+            # Closing tag right after string
+            piece_start = ''
+        elif piece[0] != '<':
+            if previous[-1] == '>':
+                # String right after tag
+                piece_start = ''
+            else:
+                piece_start = '\n' + ' ' * max(level - 1, 0)
+        else:
+            piece_start = '\n' + '\t' * max(level - 1, 0)
+        file.write(piece_start)
+        file.write(piece)
+        previous = piece
+    if previous[-1] != '>':
+        file.write('\n')
+
+
+def write_ftl_xml(soup, file):
+    """Writes bs4 or lxml tree to a file or any object with write method
+    using XML formatting of FTL.
+    """
+    write_pieces(iter_pieces(soup), file)
+
+
+def split_entries(dictionary, split_files):
+    """Splits localize dictionary into lists of (string, name) entries,
+    one list for each of split_files in the same order. Every string goes
+    to the first file whose source matches its source file, strings
+    of baseline index go nowhere.
+    """
+    buckets = [[] for _ in split_files]
+    for string, name, source_file in dictionary.entries():
+        if source_file == BASELINE_SOURCE:
+            continue
+        for bucket, (_, source) in zip(buckets, split_files):
+            if (source is None) or (source in source_file):
+                bucket.append((string, name))
+                break
+    return buckets
+
+
+def pretty_xml(soup):
+    """Prettifies bs4 or lxml trees.
+    Prettify used by BeautifulSoup is not consistent with
+    XML formatting used in FTL so trees are written by write_ftl_xml().
+    """
+    result = io.StringIO()
+    write_ftl_xml(soup, result)
+    return result.getvalue()
+
+
+# Instrument of the current run, see instrumented()
+current_instrument = contextvars.ContextVar('current_instrument', default=None)
+
+
+class Instrument:
+    """Receives structured events of a run: dictionaries with event
+    name, time in seconds since start of the run and event fields.
+
+    :param target: Callable which gets each event, logging.Logger
+        which logs them as JSON at INFO level, or path of JSON lines
+        file. None drops events.
+
+    :param profile_file: If set, phases are profiled with cProfile
+        and stats are saved to this file in pstats format.
+    """
+
+    def __init__(self, target=None, profile_file=None):
+        self.file = None
+        if target is None:
+            self.send = lambda event: None
+        elif isinstance(target, logging.Logger):
+            self.send = lambda event: target.info(json.dumps(event, ensure_ascii=False))
+        elif callable(target):
+            self.send = target
+        else:
+            self.file = open(target, 'w', encoding='utf-8')
+            self.send = lambda event: \
+                self.file.write(f'{json.dumps(event, ensure_ascii=False)}\n')
+        self.profile_file = profile_file
+        self.profiler = cProfile.Profile() if profile_file is not None else None
+        # Number of open phases, profiler is on while it's above zero
+        self.depth = 0
+        self.start = time.perf_counter()
+
+    def emit(self, event, fields):
+        """Sends event with fields to the target."""
+        self.send({'event': event, 'time': round(time.perf_counter() - self.start, 6), **fields})
+
+    def close(self):
+        """Saves profile and closes events file."""
+        if self.profiler is not None:
+            self.profiler.dump_stats(self.profile_file)
+        if self.file is not None:
+            self.file.close()
+
+
+def emit(event, **fields):
+    """Sends event to instrument of the current run if there is one."""
+    instrument = current_instrument.get()
+    if instrument is not None:
+        instrument.emit(event, fields)
+
+
+@contextlib.contextmanager
+def phase(name, **fields):
+    """Times a phase of the run and profiles it if needed,
+    sends 'phase' event when it ends.
+    """
+    instrument = current_instrument.get()
+    if instrument is None:
+        yield
+        return
+    start = time.perf_counter()
+    instrument.depth += 1
+    if (instrument.profiler is not None) and (instrument.depth == 1):
+        instrument.profiler.enable()
+    try:
+        yield
+    finally:
+        instrument.depth -= 1
+        if (instrument.profiler is not None) and (instrument.depth == 0):
+            instrument.profiler.disable()
+        instrument.emit('phase', {'phase': name,
+                                  'seconds': round(time.perf_counter() - start, 6), **fields})
+
+
+@contextlib.contextmanager
+def instrumented(target, profile_file, function, **options):
+    """Makes an instrument for the run of a function unless there is
+    one already, sends 'run' events at start and end of the run.
+    """
+    if ((target is None) and (profile_file is None)) or (current_instrument.get() is not None):
+        yield
+        return
+    instrument = Instrument(target, profile_file)
+    token = current_instrument.set(instrument)
+    try:
+        emit('run', function=function, state='started', **options)
+        yield
+        emit('run', function=function, state='finished',
+             seconds=round(time.perf_counter() - instrument.start, 6))
+    finally:
+        current_instrument.reset(token)
+        instrument.close()
+
+
+def count_tags(soup):
+    """Number of tags in bs4 or lxml tree."""
+    if isinstance(soup, LxmlDocument):
+        return sum(1 for _ in soup.tree.iter(etree.Element))
+    return len(soup.find_all(True))
+
+
+def fixbrokenxml(xmldoc, root):
+    """Prepare to parse by fixing almost well-formed xml
+    This function won't help parsing truly broken xml
+    """
+    # Adding a root tag if there is none
+    if xmldoc.find(f'<{root}>') == -1:
+        endroot = xmldoc.find('?>')
+        if endroot == -1:
+            xmldoc = f'<{root}>{xmldoc}'
+        else:
+            endroot = endroot + 2
+            xmldoc = f'{xmldoc[:endroot]}<{root}>{xmldoc[endroot:]}'
+    if xmldoc.find(f'</{root}>') == -1:
+        xmldoc = f'{xmldoc}</{root}>'
+    # Fixing extra dashes in comments
+    xmldoc.replace('<!---', '<!-- -')
+    xmldoc.replace('--->', '- -->')
+    return xmldoc
+
+
+def in_memory(files):
+    """Checks if work or output directory is a mapping
+    of file names to contents instead of a folder.
+    """
+    return isinstance(files, Mapping)
+
+
+def memory_key(filename):
+    """Key of a file in memory, subfolders are separated by /."""
+    return filename.replace(os.sep, '/')
+
+
+def is_archive(path):
+    """Checks if path is a mod archive (.ftl or .zip) and not a folder."""
+    if in_memory(path):
+        return False
+    return (os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS) and not os.path.isdir(path)
+
+
+# Mod archives kept open until the end of the run, by path
+current_archives = contextvars.ContextVar('current_archives', default=None)
+
+
+@contextlib.contextmanager
+def archives_kept_open():
+    """Keeps mod archives open for the run, so central directory
+    of an archive is read once and not for every file in it.
+    """
+    if current_archives.get() is not None:
+        yield
+        return
+    archives = {}
+    token = current_archives.set(archives)
+    try:
+        yield
+    finally:
+        current_archives.reset(token)
+        for archive in archives.values():
+            archive.close()
+
+
+@contextlib.contextmanager
+def open_archive(path):
+    """Mod archive opened for the run, or only for the caller
+    if archives are not kept open.
+    """
+    archives = current_archives.get()
+    if archives is None:
+        with zipfile.ZipFile(path) as archive:
+            yield archive
+        return
+    key = os.path.abspath(path)
+    if key not in archives:
+        archives[key] = zipfile.ZipFile(path)
+    yield archives[key]
+
+
+def list_xml_files(workdir):
+    """Names of xml files in a folder, in data folder of mod archive
+    or in memory which can be (de)localized.
+    """
+    if in_memory(workdir):
+        names = [name for name in workdir if '/' not in name]
+    elif is_archive(workdir):
+        with open_archive(workdir) as archive:
+            names = [name[len(ARCHIVE_DATA_DIR):] for name in archive.namelist()
+                     if name.startswith(ARCHIVE_DATA_DIR)]
+        names = [name for name in names if name and ('/' not in name)]
+    else:
+        names = os.listdir(workdir)
+    return [filename for filename in names if is_xml_file(filename)]
+
+
+def is_xml_file(filename):
+    """Checks if file can be (de)localized by its name."""
+    return ((filename[-4:] == '.xml') or (filename[-11:] == '.xml.append')
+            or (filename[-15:] == '.xml.rawclobber'))
+
+
+def read_file(directory, filename):
+    """Contents of a file in a folder, in data folder of mod archive
+    or in memory.
+    """
+    if in_memory(directory):
+        return directory[memory_key(filename)]
+    if is_archive(directory):
+        with open_archive(directory) as archive:
+            return archive.read(ARCHIVE_DATA_DIR + filename)
+    with open(os.path.join(directory, filename), 'rb') as file:
+        return file.read()
+
+
+def decode_contents(data):
+    """File contents as text, the same as reading it
+    in text mode with universal newlines.
+    """
+    return data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def may_need_changes(contents, mode):
+    """Cheap check of file contents before parsing. Returns False
+    only if parsed file would have nothing to localize and no defined
+    strings ('localize' mode), or no text strings and no text ids
+    ('delocalize' mode).
+    """
+    if PRESCAN_DTD.search(contents) is not None:
+        return True
+    if mode == 'localize':
+        # Empty tags have no strings, like <desc length="4"/> of animations
+        return len(PRESCAN_TAG.findall(contents)) > len(PRESCAN_EMPTY_TAG.findall(contents))
+    if PRESCAN_TEXT_TAG.search(contents) is not None:
+        return True
+    return (PRESCAN_ID_ATTR.search(contents) is not None) and \
+        (PRESCAN_TAG.search(contents) is not None)
+
+
+def prescan_files(workdir, filenames, mode):
+    """Splits files into ones which need to be parsed and ones which
+    certainly have nothing to (de)localize, see may_need_changes().
+    Returns (needed, skipped) lists of file names.
+    """
+    needed = []
+    skipped = []
+    with phase('prescan', files=len(filenames)):
+        for filename in filenames:
+            if may_need_changes(decode_contents(read_file(workdir, filename)), mode):
+                needed.append(filename)
+            else:
+                skipped.append(filename)
+                emit('counter', name='skipped', file=filename, value=1)
+    if skipped:
+        print(f'Skipped {len(skipped)} files with nothing to {mode}...')
+    return needed, skipped
+
+
+def parse_file(workdir, filename, engine='bs4'):
+    """Parse one xml file using BeautifulSoup or lxml engine."""
+    start = time.perf_counter()
+    data = read_file(workdir, filename)
+    contents = fixbrokenxml(decode_contents(data), 'FTL')
+    if (engine == 'lxml') and not INTERNAL_DTD.search(contents):
+        soup = parse_lxml(contents)
+    else:
+        # bs4 keeps only the doctype if its internal subset declares
+        # entities and moves comments out of it, so lxml engine parses
+        # such files with bs4 too to get the same result
+        soup = BeautifulSoup(contents, "lxml-xml")
+    if current_instrument.get() is not None:
+        emit('file', phase='parse', file=filename,
+             seconds=round(time.perf_counter() - start, 6),
+             bytes_read=len(data),
+             tags=count_tags(soup))
+    return soup
+
+
+def parse(workdir, engine='bs4', filenames=None):
+    """Parse xml files in a folder using BeautifulSoup
+    or lxml engine, all of them or only selected filenames.
+    """
+    if filenames is None:
+        filenames = list_xml_files(workdir)
+    soups = []
+    for filename in filenames:
+        soups.append([parse_file(workdir, filename, engine), filename])
+    print('Finished parsing xml files...')
+    return soups
+
+
+def text_bytes(write, *args):
+    """Bytes that write(*args, file) puts to a file opened in text
+    mode with utf-8 encoding, newlines are translated the same way.
+    """
+    result = io.StringIO()
+    write(*args, result)
+    contents = result.getvalue()
+    if os.linesep != '\n':
+        contents = contents.replace('\n', os.linesep)
+    return contents.encode('utf-8')
+
+
+@contextlib.contextmanager
+def atomic_file(path, fsync=False):
+    """Binary file which replaces path when the block ends without
+    errors. Data goes to a temporary file in the same folder first,
+    so path has either its previous contents or all of the new ones,
+    and the temporary file is deleted if anything fails.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    temp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(temp_path, 'wb') as file:
+            yield file
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_file_atomically(path, data, fsync=False):
+    """Writes bytes to path through a temporary file, see atomic_file()."""
+    with atomic_file(path, fsync) as file:
+        file.write(data)
+
+
+class OutputWriter:
+    """Writes result files in background threads while next files
+    are serialized. Files wait in a bounded queue, so no more than
+    queue_size serialized files are kept in memory.
+
+    :param threads: Number of writer threads, 0 writes files right away
+        in the calling thread.
+
+    :param queue_size: Number of files that can wait to be written.
+
+    :param fsync: If True, each file is flushed to disk before
+        it replaces the previous one.
+    """
+
+    def __init__(self, threads=1, queue_size=8, fsync=False):
+        self.fsync = fsync
+        self.queue = queue.Queue(queue_size)
+        # Sizes of written files by path, checked by close()
+        self.written = {}
+        self.errors = []
+        self.aborted = False
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def run(self):
+        """Writer thread: writes files from the queue until it gets None."""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if not self.aborted and not self.errors:
+                    self.write_now(*item)
+            except Exception as error:
+                self.errors.append((item[0], error))
+            finally:
+                self.queue.task_done()
+
+    def write_now(self, path, data):
+        """Writes file in the calling thread."""
+        write_file_atomically(path, data, self.fsync)
+        self.written[path] = len(data)
+
+    def check_errors(self):
+        """Raises the first error of writer threads."""
+        if self.errors:
+            path, error = self.errors[0]
+            raise Exception(f'Could not write {path}: {error}') from error
+
+    def write(self, path, data):
+        """Queues bytes to be written to path, waits if the queue is full."""
+        self.check_errors()
+        if self.threads:
+            self.queue.put((path, data))
+        else:
+            self.write_now(path, data)
+
+    def flush(self):
+        """Waits until all queued files are written."""
+        self.queue.join()
+        self.check_errors()
+
+    def close(self, abort=False):
+        """Stops writer threads. Queued files are written and sizes
+        of all written files are verified, or dropped if abort is True.
+        """
+        self.aborted = abort
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if abort:
+            return
+        self.check_errors()
+        for path, size in self.written.items():
+            if not os.path.isfile(path) or (os.path.getsize(path) != size):
+                raise Exception(f'Result file {path} was not written completely')
+
+
+# Output stage of the current run, set by output_stage()
+current_writer = contextvars.ContextVar('current_writer', default=None)
+
+
+@contextlib.contextmanager
+def output_stage(writer_threads=1, fsync=False):
+    """Result files written with write_output() in the block go through
+    an OutputWriter. When the block ends they are all on disk and
+    verified, if it fails files which are not written yet are dropped.
+    Every file is replaced atomically, so there are no partially
+    written files in output directory either way.
+    """
+    writer = OutputWriter(writer_threads, fsync=fsync)
+    token = current_writer.set(writer)
+    try:
+        yield writer
+    except BaseException:
+        writer.close(abort=True)
+        raise
+    else:
+        with phase('flush'):
+            writer.close()
+    finally:
+        current_writer.reset(token)
+
+
+def write_output(outputdir, filename, data):
+    """Writes result file through output stage of the current run,
+    or right away if there is none. Files in memory are just stored
+    in outputdir.
+    """
+    if in_memory(outputdir):
+        outputdir[memory_key(filename)] = data
+        return
+    path = os.path.join(outputdir, filename)
+    writer = current_writer.get()
+    if writer is None:
+        write_file_atomically(path, data)
+    else:
+        writer.write(path, data)
+
+
+def flush_output():
+    """Waits until result files queued in the current run are written."""
+    writer = current_writer.get()
+    if writer is not None:
+        writer.flush()
+
+
+def write_xml(soup, outputdir, filename):
+    """Serializes prettified tree and writes it to output directory."""
+    start = time.perf_counter()
+    data = text_bytes(write_ftl_xml, soup)
+    write_output(outputdir, filename, data)
+    if current_instrument.get() is not None:
+        emit('file', phase='write', file=filename,
+             seconds=round(time.perf_counter() - start, 6), bytes_written=len(data))
+
+
+def copy_archive_member(source, target, info):
+    """Copies a member of source zip archive to target archive
+    as it is stored, without decompressing and compressing it again.
+    Writes to target the same way as ZipFile.write() does, using its
+    internal fp, start_dir, NameToInfo and _didModify under its lock.
+    They were checked with zipfile of RAW_COPY_VERSIONS, with other
+    Python versions the member is decompressed and compressed again
+    through ZipFile.open().
+    """
+    if info.flag_bits & 0x01:
+        raise Exception(f'Encrypted archive member {info.filename}')
+    first, last = RAW_COPY_VERSIONS
+    if not first <= sys.version_info[:2] <= last:
+        copied = zipfile.ZipInfo(info.filename, info.date_time)
+        for attr in ('compress_type', 'comment', 'create_system', 'external_attr',
+                     'file_size'):
+            setattr(copied, attr, getattr(info, attr))
+        with source.open(info) as source_file, target.open(copied, 'w') as target_file:
+            shutil.copyfileobj(source_file, target_file)
+        return
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    source.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    data = source.fp.read(info.compress_size)
+    copied = zipfile.ZipInfo(info.filename, info.date_time)
+    for attr in ('compress_type', 'comment', 'create_system', 'create_version',
+                 'extract_version', 'internal_attr', 'external_attr',
+                 'CRC', 'compress_size', 'file_size'):
+        setattr(copied, attr, getattr(info, attr))
+    # Sizes are known, so there is no data descriptor after the data,
+    # zip64 fields are added by zipfile again if needed
+    copied.flag_bits = info.flag_bits & ~0x08
+    extra = info.extra
+    copied.extra = b''
+    while len(extra) >= 4:
+        field_id, field_length = struct.unpack('<HH', extra[:4])
+        if field_id != 1:
+            copied.extra += extra[:4 + field_length]
+        extra = extra[4 + field_length:]
+    with target._lock:
+        target.fp.seek(target.start_dir)
+        copied.header_offset = target.fp.tell()
+        target.fp.write(copied.FileHeader())
+        target.fp.write(data)
+        target.start_dir = target.fp.tell()
+        target.filelist.append(copied)
+        target.NameToInfo[copied.filename] = copied
+        target._didModify = True
+
+
+def write_archive_member(target, name, result):
+    """Writes result file from its path or from memory to archive."""
+    if isinstance(result, bytes):
+        target.writestr(name, result)
+    else:
+        target.write(result, name)
+
+
+def write_archive(workdir, results, archive_file, fsync=False):
+    """Makes mod archive from result files, which go to data folder,
+    and other files of work directory or its archive in one pass.
+    Results are a folder or a mapping of file names to contents.
+    Members of work archive are copied without recompression,
+    files of work directory in memory are compressed.
+    Archive replaces the previous one only when it is complete.
+    """
+    if in_memory(results):
+        results = {ARCHIVE_DATA_DIR + name: data for name, data in results.items()}
+    else:
+        resultdir, results = results, {}
+        for root, _, filenames in os.walk(resultdir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, resultdir).replace(os.sep, '/')
+                results[ARCHIVE_DATA_DIR + name] = path
+    with atomic_file(archive_file, fsync) as file, \
+            zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as target:
+        if is_archive(workdir):
+            with open_archive(workdir) as source:
+                for info in source.infolist():
+                    if info.filename in results:
+                        write_archive_member(target, info.filename,
+                                             results.pop(info.filename))
+                    else:
+                        copy_archive_member(source, target, info)
+        elif in_memory(workdir):
+            for filename, data in workdir.items():
+                name = ARCHIVE_DATA_DIR + filename
+                write_archive_member(target, name, results.pop(name, data))
+        else:
+            for filename in os.listdir(workdir):
+                path = os.path.join(workdir, filename)
+                if os.path.isfile(path):
+                    name = ARCHIVE_DATA_DIR + filename
+                    write_archive_member(target, name, results.pop(name, path))
+        for name, result in results.items():
+            write_archive_member(target, name, result)
+    print(f'Finished writing archive {archive_file}...')
+
+
+@contextlib.contextmanager
+def output_folder(workdir, outputdir, fsync=False, workers=1, low_memory=False):
+    """Folder for result files. If outputdir is a mod archive, files are
+    kept in memory and the archive is made from them and other files
+    of the mod when the run is done. Worker processes write files
+    themselves and low_memory run doesn't keep them, so then they are
+    written to a temporary folder first. Files in memory are put
+    to outputdir mapping as they are written.
+    """
+    if in_memory(outputdir):
+        yield outputdir
+        return
+    if not is_archive(outputdir):
+        check_and_create_dir(outputdir)
+        yield outputdir
+        return
+    if not in_memory(workdir) and (os.path.abspath(outputdir) == os.path.abspath(workdir)):
+        raise Exception('Output archive is the same as work archive')
+    if (workers <= 1) and not low_memory:
+        results = {}
+        yield results
+        with phase('archive'):
+            write_archive(workdir, results, outputdir, fsync)
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield temp_dir
+        with phase('archive'):
+            write_archive(workdir, temp_dir, outputdir, fsync)
+
+
+def detach_string(string):
+    """Copy of a string from the tree which doesn't keep the whole
+    tree alive and can be sent to another process.
+    """
+    if isinstance(string, (Comment, XMLProcessingInstruction)):
+        return type(string)(str(string))
+    if string is not None:
+        return str(string)
+    return None
+
+
+def find_tags(soup, names, condition):
+    """Finds tags with one of names which match condition in document
+    order. lxml trees select tags by name in C and call condition only
+    for them, bs4 trees check every tag.
+    """
+    if isinstance(soup, LxmlDocument):
+        return [tag for tag in soup.find_tags(names) if condition(tag)]
+    return soup.find_all(lambda tag: (tag.name in names) and condition(tag))
+
+
+def iter_defined_texts(soup):
+    """Yields (language, name, string) of text tags which define
+    a string, language is None if the tag has none. Strings are
+    still part of the tree, see detach_string().
+    """
+    for text_tag in soup.find_all('text'):
+        if (text_tag.string is not None) and text_tag.has_attr('name'):
+            lang = text_tag['language'] if 'language' in text_tag.attrs else None
+            yield lang, text_tag['name'], text_tag.string
+
+
+def find_defined_strings(soup):
+    """Finds text strings that are already defined in text files,
+    returns list of (string, name) pairs.
+    """
+    return [(detach_string(string), name) for _, name, string in iter_defined_texts(soup)]
+
+
+def find_language_strings(soup, lang):
+    """Finds text strings defined for selected language,
+    returns list of (name, string) pairs.
+    """
+    return find_strings_by_language(soup, [lang])[lang]
+
+
+def find_strings_by_language(soup, languages):
+    """Finds text strings defined for any of selected languages
+    in one pass over text tags,
+    returns {language: [(name, string)...]}.
+    """
+    result = {lang: [] for lang in languages}
+    for lang, name, string in iter_defined_texts(soup):
+        if lang in result:
+            result[lang].append((name, detach_string(string)))
+    return result
+
+
+def find_ids_to_delocalize(soup, ignore_continue):
+    """Finds tags with text ids which need to be replaced with text strings."""
+
+    def need_to_delocalize(tag):
+        """Conditions that can be used by bs4 find_all function."""
+        result = False
+        if tag.name in ALL_TAGS:
+            if (tag.string is None) and tag.has_attr('id'):
+                result = (not ignore_continue) or (tag['id'] != 'continue')
+        return result
+
+    return find_tags(soup, ALL_TAGS, need_to_delocalize)
+
+
+def replace_ids(text_tags, dictionary, empty_string):
+    """Replace text ids in tags with matching text strings
+    from the dictionary.
+    """
+
+    def get_text_string(tag):
+        """Safer function to get value from dictionary."""
+        result = None
+        if 'id' in tag.attrs:
+            result = dictionary.get(tag['id'])
+        return result
+
+    for text_tag in text_tags:
+        text_string = get_text_string(text_tag)
+        if text_string is not None:
+            text_tag.string = text_string
+        else:
+            text_tag.string = empty_string
+        del text_tag['id']
+
+
+def need_to_localize(tag):
+    """Conditions that can be used by bs4 find_all function."""
+    result = False
+    if tag.name in ALL_TAGS:
+        if (tag.string is not None) and (not tag.string.isdigit()):
+            result = (tag.name != 'text') or not tag.has_attr('name')
+    return result
+
+
+def child_tags(tag):
+    """Child tags of bs4 or lxml tag, strings and comments are skipped."""
+    if isinstance(tag, LxmlTag):
+        return tag.iterchildren(etree.Element)
+    return [child for child in tag.contents if isinstance(child, Tag)]
+
+
+def find_strings_to_localize(soup):
+    """Find text strings that need to be localized in a tree and
+    get ids for them in a single pass over the tree.
+    Returns tags and matching records (string, new_id, nested_in)
+    in document order. nested_in is the index of localizable tag
+    containing this one: once that tag is localized this one
+    is not in the tree anymore.
+    """
+
+    def get_attr(_tag):
+        """Safer function to get attribute."""
+        if _tag.has_attr('name'):
+            return f'_{_tag["name"]}'
+        else:
+            return ''
+
+    def get_textid(tag, name, sibling_number):
+        """Get a short (and hopefully unique) id for text tag,
+        keeps names as close to vanilla as possible.
+        Ids are formed from open tags in the stack: first one is the root,
+        second one is the top tag (event, textList, shipBlueprint...).
+        Parent keeps choice numbers c1_c2_c1_c10... of all choices
+        under top tag (child_str) or under its child (child_str_low).
+        """
+        result = None
+        if len(stack) > 1:
+            parent = stack[-1]
+            parent_top = stack[1]
+            parent_str = PARENT_TAG_DICT.get(parent['name'], parent['name'])
+            if (name == 'text') and not tag.has_attr('name'):
+                if parent_top['name'] == 'textList':
+                    result = f'text{get_attr(parent_top["tag"])}_{sibling_number}'
+                elif parent_top['name'] == 'event':
+                    result = f'event{get_attr(parent_top["tag"])}' \
+                             f'{parent["child_str"]}_{parent_str}'
+                elif len(stack) > 2:
+                    if parent_top['name'] == 'eventList':
+                        result = f'event{get_attr(parent_top["tag"])}_' \
+                                 f'{stack[2]["sibling_number"]}' \
+                                 f'{parent["child_str_low"]}_{parent_str}'
+                    elif parent_top['name'] == 'ship':
+                        result = f'ship{get_attr(parent_top["tag"])}_{stack[2]["name"]}' \
+                                 f'{parent["child_str_low"]}_{parent_str}'
+            elif name in BLUEPRINT_TAGS:
+                if parent_top['name'][-9:] == 'Blueprint':
+                    result = f'{parent_top["name"][:-9]}{get_attr(parent_top["tag"])}_{name}'
+            elif name == 'name':
+                if parent_top['name'] == 'shipBlueprint':
+                    result = f'{parent_top["name"][:-9]}{get_attr(parent_top["tag"])}_{name}'
+            elif name == 'power':
+                if parent_top['name'] == 'crewBlueprint' and parent['name'] == 'powerList':
+                    result = f'{parent_top["name"][:-9]}{get_attr(parent_top["tag"])}_{name}' \
+                             f'{sibling_number}'
+            elif name == 'crewMember':
+                result = f'name_crewMember_{tag.string}'
+        return result
+
+    tags = []
+    records = []
+    if isinstance(soup, LxmlDocument):
+        root_tags = [soup.tree.getroot()]
+    else:
+        root_tags = child_tags(soup)
+    # Open tags from the root down to the parent of current tag
+    stack = []
+    # Iterators over children of open tags and counters of their names
+    children = [iter(root_tags)]
+    counters = [{}]
+    while children:
+        tag = next(children[-1], None)
+        if tag is None:
+            children.pop()
+            counters.pop()
+            if stack:
+                stack.pop()
+            continue
+        name = tag.name
+        sibling_number = counters[-1].get(name, 0) + 1
+        counters[-1][name] = sibling_number
+        child_str = ''
+        child_str_low = ''
+        nested_in = None
+        if stack:
+            child_str = stack[-1]['child_str']
+            child_str_low = stack[-1]['child_str_low']
+            nested_in = stack[-1]['nested_in']
+        if (name in ALL_TAGS) and need_to_localize(tag):
+            tags.append(tag)
+            records.append((detach_string(tag.string),
+                            get_textid(tag, name, sibling_number), nested_in))
+            nested_in = len(tags) - 1
+        if name == 'choice':
+            if len(stack) >= 2:
+                child_str = f'{child_str}_c{sibling_number}'
+            if len(stack) >= 3:
+                child_str_low = f'{child_str_low}_c{sibling_number}'
+        stack.append({'tag': tag, 'name': name, 'sibling_number': sibling_number,
+                      'child_str': child_str, 'child_str_low': child_str_low,
+                      'nested_in': nested_in})
+        children.append(iter(child_tags(tag)))
+        counters.append({})
+    return tags, records
+
+
+def set_text_ids(tags, ids):
+    """Replace text strings with links to text file."""
+    for tag, text_id in zip(tags, ids):
+        if text_id is not None:
+            tag.clear()
+            tag['id'] = text_id
+
+
+# Dictionary shared with tasks of the current run, set by init_worker
+# in pool workers and by run_tasks in this process
+shared_dictionary = contextvars.ContextVar('shared_dictionary', default=None)
+
+
+def init_worker(dictionary, fsync=None):
+    """Process pool initializer, keeps shared dictionary in the worker.
+    If fsync is set, worker process writes result files right away
+    with the same fsync option as output stage of the main process.
+    Mod archives stay open while the worker lives.
+    """
+    shared_dictionary.set(dictionary)
+    current_archives.set({})
+    if fsync is not None:
+        current_writer.set(OutputWriter(0, fsync=fsync))
+
+
+def run_tasks(function, tasks, workers, dictionary=None):
+    """Runs tasks in a pool of worker processes, or in this process
+    if there is only one worker. Returns results in order of tasks.
+    dictionary is shared with all tasks through shared_dictionary.
+    """
+    if (workers > 1) and (len(tasks) > 1):
+        instrument = current_instrument.get()
+        writer = current_writer.get()
+        fsync = writer.fsync if writer is not None else False
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(dictionary, fsync)) as executor:
+            if instrument is None:
+                return list(executor.map(function, tasks))
+            result = []
+            for task_result, events in executor.map(run_instrumented_task,
+                                                    [(function, task) for task in tasks]):
+                for event in events:
+                    instrument.emit(event.pop('event'), {key: value for key, value
+                                                         in event.items() if key != 'time'})
+                result.append(task_result)
+            return result
+    token = shared_dictionary.set(dictionary)
+    try:
+        return [function(task) for task in tasks]
+    finally:
+        shared_dictionary.reset(token)
+
+
+def run_instrumented_task(task):
+    """Process pool task: runs another task and collects its events
+    to be sent by instrument of the main process.
+    """
+    function, task = task
+    events = []
+    token = current_instrument.set(Instrument(events.append))
+    try:
+        return function(task), events
+    finally:
+        current_instrument.reset(token)
+
+
+def release_tree(soup):
+    """Frees a parsed tree right away. bs4 trees are full of reference
+    cycles and are otherwise kept until the garbage collector runs,
+    lxml trees are freed as soon as they are not referenced.
+    """
+    if isinstance(soup, BeautifulSoup):
+        # lxml-xml builder doesn't link the soup object itself to its
+        # first element, so decompose() wouldn't reach the children
+        for element in list(soup.contents):
+            element.decompose()
+        soup.decompose()
+
+
+def scan_file_for_localize(task):
+    """Process pool task: parse file, get already defined text strings
+    and text strings that need to be localized.
+    """
+    workdir, filename, engine = task
+    soup = parse_file(workdir, filename, engine)
+    result = find_defined_strings(soup), find_strings_to_localize(soup)[1]
+    release_tree(soup)
+    return result
+
+
+def rewrite_file_for_localize(task):
+    """Process pool task: parse file again, replace text strings
+    with assigned ids and write it to output directory.
+    """
+    workdir, outputdir, filename, engine, ids = task
+    soup = parse_file(workdir, filename, engine)
+    set_text_ids(find_tags(soup, ALL_TAGS, need_to_localize), ids)
+    write_xml(soup, outputdir, filename)
+    release_tree(soup)
+
+
+def scan_file_for_delocalize(task):
+    """Process pool task: parse file, get text strings for selected
+    language and text ids that need to be replaced.
+    """
+    workdir, filename, engine, lang, ignore_continue = task
+    soup = parse_file(workdir, filename, engine)
+    result = (find_language_strings(soup, lang),
+              [tag['id'] for tag in find_ids_to_delocalize(soup, ignore_continue)])
+    release_tree(soup)
+    return result
+
+
+def rewrite_file_for_delocalize(task):
+    """Process pool task: parse file again, replace text ids with
+    text strings from shared dictionary and write it to output directory.
+    """
+    workdir, outputdir, filename, engine, empty_string, ignore_continue = task
+    soup = parse_file(workdir, filename, engine)
+    replace_ids(find_ids_to_delocalize(soup, ignore_continue),
+                shared_dictionary.get(), empty_string)
+    write_xml(soup, outputdir, filename)
+    release_tree(soup)
+
+
+def scan_file_for_report(task):
+    """Process pool task: parse file, get (language, name) of text
+    strings defined in it for any language and text ids that need
+    to be replaced.
+    """
+    workdir, filename, engine, ignore_continue = task
+    soup = parse_file(workdir, filename, engine)
+    definitions = [(lang, name) for lang, name, _ in iter_defined_texts(soup)]
+    result = definitions, [tag['id'] for tag in find_ids_to_delocalize(soup, ignore_continue)]
+    release_tree(soup)
+    return result
+
+
+def scan_file_records(task):
+    """Process pool task: parse file and get what scans of any function
+    need from it, to be kept in parse cache: (language, name, string)
+    of defined text strings, records of strings to localize
+    and all text ids to delocalize.
+    """
+    workdir, filename, engine = task
+    soup = parse_file(workdir, filename, engine)
+    texts = [(lang, name, detach_string(string))
+             for lang, name, string in iter_defined_texts(soup)]
+    result = (texts, find_strings_to_localize(soup)[1],
+              [tag['id'] for tag in find_ids_to_delocalize(soup, False)])
+    release_tree(soup)
+    return result
+
+
+def scan_from_records(function, task, records):
+    """Result of scan task made from records of scan_file_records()."""
+    texts, localize_records, ids = records
+    if function is scan_file_for_localize:
+        return [(string, name) for _, name, string in texts], localize_records
+    if function is scan_file_for_delocalize:
+        lang, ignore_continue = task[3:]
+    else:
+        lang, ignore_continue = None, task[3]
+    if ignore_continue:
+        ids = [text_id for text_id in ids if text_id != 'continue']
+    if function is scan_file_for_delocalize:
+        return [(name, string) for text_lang, name, string in texts if text_lang == lang], ids
+    return [(text_lang, name) for text_lang, name, _ in texts], ids
+
+
+def file_hash(directory, filename):
+    """SHA-256 hash of file contents."""
+    return hashlib.sha256(read_file(directory, filename)).hexdigest()
+
+
+# Files which watch() found unchanged since its previous successful run
+current_unchanged = contextvars.ContextVar('current_unchanged', default=frozenset())
+
+
+def hash_files(workdir, filenames, manifest):
+    """Hashes of file contents by file name. Files that watch() found
+    unchanged keep their hash from manifest and are not read again.
+    """
+    unchanged = current_unchanged.get()
+    known = manifest['files']
+    return {filename: known[filename]['hash']
+            if (filename in unchanged) and (filename in known)
+            else file_hash(workdir, filename)
+            for filename in filenames}
+
+
+def encode_strings(value):
+    """Makes lists with text strings JSON serializable,
+    comments and processing instructions keep their type.
+    """
+    if isinstance(value, Comment):
+        return {'comment': str(value)}
+    if isinstance(value, XMLProcessingInstruction):
+        return {'pi': str(value)}
+    if isinstance(value, (list, tuple)):
+        return [encode_strings(item) for item in value]
+    return value
+
+
+def decode_strings(value):
+    """Reverses encode_strings()."""
+    if isinstance(value, dict):
+        if 'comment' in value:
+            return Comment(value['comment'])
+        return XMLProcessingInstruction(value['pi'])
+    if isinstance(value, list):
+        return [decode_strings(item) for item in value]
+    return value
+
+
+# Manifests kept in memory between runs of watch(), by path
+current_manifests = contextvars.ContextVar('current_manifests', default=None)
+
+
+def load_manifest(outputdir, options):
+    """Reads manifest of previous incremental run from output directory.
+    Files are forgotten if there is no manifest or it was made with
+    other options, only the list of written outputs is kept to delete
+    the ones that are not needed anymore.
+    """
+    manifest = {'version': MANIFEST_VERSION, 'options': options, 'files': {}, 'outputs': []}
+    path = os.path.join(outputdir, MANIFEST_FILE)
+    if os.path.isfile(path):
+        manifests = current_manifests.get()
+        if (manifests is not None) and (path in manifests):
+            stored = dict(manifests[path])
+        else:
+            with open(path, 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+        if (stored.get('version') == MANIFEST_VERSION) and (stored.get('options') == options):
+            manifest = stored
+        else:
+            manifest['outputs'] = stored.get('outputs', [])
+    return manifest
+
+
+def save_manifest(outputdir, manifest, outputs):
+    """Deletes outputs of previous run which were not written this time
+    and saves manifest to output directory when queued result files
+    are written.
+    """
+    for filename in set(manifest['outputs']) - set(outputs):
+        if os.path.isfile(os.path.join(outputdir, filename)):
+            os.remove(os.path.join(outputdir, filename))
+            print(f'Deleted outdated file {filename}...')
+    manifest['outputs'] = outputs
+    path = os.path.join(outputdir, MANIFEST_FILE)
+    # Manifest never lists files which are not on disk yet,
+    # dumps() uses C encoder, dump() streams through Python one
+    flush_output()
+    write_output(outputdir, MANIFEST_FILE,
+                 json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+    manifests = current_manifests.get()
+    if manifests is not None:
+        manifests[path] = manifest
+
+
+def is_outdated(previous, outputdir, filename, **current):
+    """Checks if output file has to be written again: it's missing
+    or any of current values differs from previous manifest entry.
+    """
+    if (previous is None) or not previous.get('written'):
+        return True
+    if not os.path.isfile(os.path.join(outputdir, filename)):
+        return True
+    return any(previous.get(key) != value for key, value in current.items())
+
+
+def tool_version():
+    """Hash of this module and versions of parsers,
+    any change of them makes parse cache entries outdated.
+    """
+    with open(__file__, 'rb') as file:
+        source = file.read()
+    parsers = f'{PARSE_CACHE_VERSION} {bs4.__version__} {etree.LXML_VERSION}'
+    return hashlib.sha256(source + parsers.encode('utf-8')).hexdigest()
+
+
+class ParseCache:
+    """Records of parsed files kept between runs: text strings of all
+    languages, strings to localize and text ids, which is everything
+    scans of localize(), delocalize(), coverage_report() and delta()
+    take from a file. Entries are keyed by hash of file contents and
+    engine and saved as JSON files in cache folder, recently used
+    ones are also kept in memory. Runs in "with cache:" block use it
+    and switch to scanning in phases, so files found in cache
+    are parsed only if they have to be written.
+
+    :param cache_dir: Folder of cache files, created if needed.
+        Entries made by other version of the tool are deleted.
+
+    :param memory_limit: Size in bytes of entries kept in memory,
+        counted as size of their JSON files. 0 keeps none.
+    """
+
+    def __init__(self, cache_dir, memory_limit=64 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        # {key: (records, size)} from least to most recently used
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.lock = threading.Lock()
+        self.tokens = []
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.version = tool_version()
+        os.makedirs(cache_dir, exist_ok=True)
+        version_file = os.path.join(cache_dir, PARSE_CACHE_VERSION_FILE)
+        previous = None
+        if os.path.isfile(version_file):
+            with open(version_file, 'r', encoding='utf-8') as file:
+                previous = file.read()
+        if previous != self.version:
+            for filename in os.listdir(cache_dir):
+                if filename.startswith('parse-') and filename.endswith('.json'):
+                    os.remove(os.path.join(cache_dir, filename))
+            write_file_atomically(version_file, self.version.encode('utf-8'))
+
+    def __enter__(self):
+        self.tokens.append(current_parse_cache.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        current_parse_cache.reset(self.tokens.pop())
+
+    def key(self, sha256, engine):
+        """Key of file entry by hash of its contents."""
+        return hashlib.sha256(f'{self.version} {engine} {sha256}'.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        """Cache file of entry."""
+        return os.path.join(self.cache_dir, f'parse-{key}.json')
+
+    def remember(self, key, records, size):
+        """Keeps entry in memory, least recently used ones
+        are dropped when memory_limit is exceeded.
+        """
+        if size > self.memory_limit:
+            return
+        if key in self.memory:
+            self.memory_size -= self.memory.pop(key)[1]
+        self.memory[key] = (records, size)
+        self.memory_size += size
+        while self.memory_size > self.memory_limit:
+            self.memory_size -= self.memory.popitem(last=False)[1][1]
+
+    def get(self, key):
+        """Records of file entry or None if it's not in cache."""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return self.memory[key][0]
+        try:
+            with open(self.path(key), 'rb') as file:
+                data = file.read()
+            records = decode_strings(json.loads(data))
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+            self.remember(key, records, len(data))
+        return records
+
+    def put(self, key, records):
+        """Saves records of file entry."""
+        data = json.dumps(encode_strings(records), ensure_ascii=False).encode('utf-8')
+        write_file_atomically(self.path(key), data)
+        with self.lock:
+            self.remember(key, records, len(data))
+
+    def stats(self):
+        """Numbers of hits (from memory too) and misses
+        since cache was made, entries and bytes in memory.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'memory_hits': self.memory_hits, 'misses': self.misses,
+                    'memory_entries': len(self.memory), 'memory_bytes': self.memory_size}
+
+
+# Parse cache used by runs in "with cache:" block
+current_parse_cache = contextvars.ContextVar('current_parse_cache', default=None)
+
+
+def run_scans(function, tasks, workers):
+    """Runs scan tasks (workdir, filename, engine, ...) with run_tasks(),
+    or makes their results from parse cache of the current run if
+    there is one. Files missing from cache are scanned for all records
+    with scan_file_records() and added to it.
+    """
+    cache = current_parse_cache.get()
+    if (cache is None) or not tasks:
+        return run_tasks(function, tasks, workers)
+    keys = [cache.key(file_hash(task[0], task[1]), task[2]) for task in tasks]
+    found = [cache.get(key) for key in keys]
+    missing = [number for number, records in enumerate(found) if records is None]
+    for task, records in zip(tasks, found):
+        emit('counter', name='cache_hits' if records is not None else 'cache_misses',
+             file=task[1], value=1)
+    scanned = run_tasks(scan_file_records, [tasks[number][:3] for number in missing], workers)
+    for number, records in zip(missing, scanned):
+        cache.put(keys[number], records)
+        found[number] = records
+    print(f'Found {len(tasks) - len(missing)} of {len(tasks)} files in parse cache...')
+    return [scan_from_records(function, task, records) for task, records in zip(tasks, found)]
+
+
+class StringTable(Mapping):
+    """Dictionary of text strings and their ids made from text files:
+    {string: id} for localize(), which looks ids up by text string,
+    or {id: string} for delocalize(), which looks strings up by id.
+    Source file of each entry is a number in an array, every file
+    name is stored once. Keys keep the place they were first added
+    at, and get value and source of the last entry.
+
+    :param by: 'text' or 'id', key of the dictionary.
+    """
+
+    __slots__ = ('by_text', 'index', 'sources', 'moved_sources', 'source_names',
+                 'source_numbers')
+
+    def __init__(self, by='text'):
+        self.by_text = by == 'text'
+        self.index = {}
+        # Source numbers in order of keys
+        self.sources = array.array('I')
+        # Sources of keys added again, by key
+        self.moved_sources = {}
+        self.source_names = []
+        self.source_numbers = {}
+
+    def add(self, string, name, source=None):
+        """Adds text string with its id and source file."""
+        source_number = self.source_numbers.get(source)
+        if source_number is None:
+            source_number = self.source_numbers[source] = len(self.source_names)
+            self.source_names.append(source)
+        key, value = (string, name) if self.by_text else (name, string)
+        if key in self.index:
+            self.moved_sources[key] = source_number
+        else:
+            self.sources.append(source_number)
+        self.index[key] = value
+
+    def entries(self):
+        """Yields (string, name, source) for every key in the order keys
+        were added, that's how localize() writes them to text files.
+        """
+        moved_sources, source_names = self.moved_sources, self.source_names
+        for (key, value), source_number in zip(self.index.items(), self.sources):
+            if moved_sources:
+                source_number = moved_sources.get(key, source_number)
+            if self.by_text:
+                yield key, value, source_names[source_number]
+            else:
+                yield value, key, source_names[source_number]
+
+    def __getitem__(self, key):
+        return self.index[key]
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, key, default=None):
+        return self.index.get(key, default)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+def index_source(directory, filename, soup):
+    """Index record of a file: (filename, hash, number of text ids
+    to delocalize, same without continue ids).
+    """
+    ids = [tag['id'] for tag in find_ids_to_delocalize(soup, False)]
+    return (filename, file_hash(directory, filename), len(ids),
+            sum(1 for text_id in ids if text_id != 'continue'))
+
+
+def write_index(index_file, dictionaries, sources):
+    """Writes {language: {id: string}} dictionaries and records
+    of source files made by index_source() to index file.
+    """
+    data = bytearray()
 
+    def add_data(string):
+        """Appends string to string data, returns its offset and length."""
+        encoded = string.encode('utf-8')
+        data.extend(encoded)
+        return len(data) - len(encoded), len(encoded)
 
-def check_language(lang):
-    """Checks if language is supported by FTL."""
-    result = None
-    if lang in SUPPORTED_LANGUAGES:
-        result = lang
-    return result
+    languages = sorted(dictionaries, key=lambda lang: lang or '')
+    entries_offset = INDEX_HEADER.size + INDEX_LANGUAGE.size * len(languages) \
+        + INDEX_SOURCE.size * len(sources)
+    data_offset = entries_offset + INDEX_ENTRY.size * sum(len(dictionaries[lang])
+                                                          for lang in languages)
+    header = [INDEX_HEADER.pack(INDEX_MAGIC, len(languages), len(sources), data_offset)]
+    entries = []
+    for lang in languages:
+        header.append(INDEX_LANGUAGE.pack(*add_data(lang or ''), entries_offset,
+                                          len(dictionaries[lang])))
+        entries_offset += INDEX_ENTRY.size * len(dictionaries[lang])
+        # Sorted by utf-8 bytes to be searched in the mapped file
+        for text_id, string in sorted(dictionaries[lang].items(),
+                                      key=lambda item: item[0].encode('utf-8')):
+            string_type = 0
+            for number, string_class in enumerate(INDEX_STRING_TYPES[1:], 1):
+                if isinstance(string, string_class):
+                    string_type = number
+            entries.append(INDEX_ENTRY.pack(*add_data(text_id), *add_data(string), string_type))
+    for filename, sha256, ids, ids_without_continue in sources:
+        header.append(INDEX_SOURCE.pack(*add_data(filename), bytes.fromhex(sha256),
+                                        ids, ids_without_continue))
+    with atomic_file(index_file) as file:
+        file.write(b''.join(header))
+        file.write(b''.join(entries))
+        file.write(data)
 
 
-def pretty_xml(soup):
-    """Prettifies bs4 trees.
-    Prettify used by BeautifulSoup is not consistent with
-    XML formatting used in FTL so we need to fix it using
-    other means.
+class StringIndex(Mapping):
+    """Read-only {id: string} dictionary of one language from index file.
+    File is memory-mapped and ids are looked up with binary search
+    when needed, so opening it doesn't depend on the number of strings.
+    Language missing from index has no strings.
     """
-    result = soup.prettify(encoding='utf-8').decode('utf-8')
-    # regex: remove first space in each line
-    result = re.sub(r'\n ', '\n', result)
-    # regex : remove newline and indent if this line is a tag but next line is not
-    result = re.sub(r'(?<=>)\n *(?! *<)', '', result)
-    # regex : remove newline and indent if this line is not a tag but next line is
-    result = re.sub(r'(?<!>)\n *(?=</)', '', result)
-    # regex: replace spaces with tabs before opening bracket <
-    result = re.sub(r'(?<=\s) (?= *<)', '\t', result)
-    return result
 
+    def __init__(self, index_file, lang):
+        self.index_file = index_file
+        self.lang = lang
+        # Strings that were already looked up
+        self.cache = {}
+        with open(index_file, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, languages, sources, self.data_offset = INDEX_HEADER.unpack_from(self.map)
+        if magic != INDEX_MAGIC:
+            raise Exception('Index file not supported')
+        self.entries_offset = 0
+        self.count = 0
+        for number in range(languages):
+            offset, length, entries_offset, count = INDEX_LANGUAGE.unpack_from(
+                self.map, INDEX_HEADER.size + INDEX_LANGUAGE.size * number)
+            if self.read(offset, length) == (lang or '').encode('utf-8'):
+                self.entries_offset = entries_offset
+                self.count = count
+        self.sources = {}
+        for number in range(sources):
+            offset, length, sha256, ids, ids_without_continue = INDEX_SOURCE.unpack_from(
+                self.map, INDEX_HEADER.size + INDEX_LANGUAGE.size * languages
+                + INDEX_SOURCE.size * number)
+            self.sources[self.read(offset, length).decode('utf-8')] = \
+                (sha256.hex(), ids, ids_without_continue)
 
-def parse(workdir):
-    """Parse xml files in a folder using BeautifulSoup."""
+    def __reduce__(self):
+        # Worker processes map the file themselves
+        return StringIndex, (self.index_file, self.lang)
 
-    def fixbrokenxml(xmldoc, root):
-        """Prepare to parse by fixing almost well-formed xml
-        This function won't help parsing truly broken xml
-        """
-        # Adding a root tag if there is none
-        if xmldoc.find(f'<{root}>') == -1:
-            endroot = xmldoc.find('?>')
-            if endroot == -1:
-                xmldoc = f'<{root}>{xmldoc}'
+    def read(self, offset, length):
+        """Bytes from string data."""
+        return self.map[self.data_offset + offset:self.data_offset + offset + length]
+
+    def entry(self, number):
+        """Entry by its number in sorted entries."""
+        return INDEX_ENTRY.unpack_from(self.map, self.entries_offset + INDEX_ENTRY.size * number)
+
+    def find(self, text_id):
+        """Entry of text id or None."""
+        if not isinstance(text_id, str):
+            return None
+        key = text_id.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self.entry(middle)
+            current = self.read(entry[0], entry[1])
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
             else:
-                endroot = endroot + 2
-                xmldoc = f'{xmldoc[:endroot]}<{root}>{xmldoc[endroot:]}'
-        if xmldoc.find(f'</{root}>') == -1:
-            xmldoc = f'{xmldoc}</{root}>'
-        # Fixing extra dashes in comments
-        xmldoc.replace('<!---', '<!-- -')
-        xmldoc.replace('--->', '- -->')
-        return xmldoc
+                return entry
+        return None
 
-    soups = []
-    for filename in os.listdir(workdir):
-        full_path = os.path.join(workdir, filename)
-        if ((full_path[-4:] == '.xml') or (full_path[-11:] == '.xml.append')
-                or (full_path[-15:] == '.xml.rawclobber')):
-            file = open(full_path, 'r', encoding="utf-8", errors='ignore')
-            contents = file.read()
-            contents = fixbrokenxml(contents, 'FTL')
-            soup = BeautifulSoup(contents, "lxml-xml")
-            soups.append([soup, filename])
-    print('Finished parsing xml files...')
-    return soups
+    def has_no_ids(self, directory, filename, ignore_continue):
+        """Checks if file is an unchanged source of the index
+        with no text ids to delocalize, so it doesn't need to be parsed.
+        """
+        if filename not in self.sources:
+            return False
+        sha256, ids, ids_without_continue = self.sources[filename]
+        if (ids_without_continue if ignore_continue else ids) > 0:
+            return False
+        return file_hash(directory, filename) == sha256
+
+    def __getitem__(self, text_id):
+        if text_id in self.cache:
+            return self.cache[text_id]
+        entry = self.find(text_id)
+        if entry is None:
+            raise KeyError(text_id)
+        string = INDEX_STRING_TYPES[entry[4]](self.read(entry[2], entry[3]).decode('utf-8'))
+        self.cache[text_id] = string
+        return string
+
+    def __contains__(self, text_id):
+        return self.find(text_id) is not None
+
+    def __iter__(self):
+        for number in range(self.count):
+            entry = self.entry(number)
+            yield self.read(entry[0], entry[1]).decode('utf-8')
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Unmaps index file."""
+        self.map.close()
+
+
+def build_index(workdir, index_file, languages=None, engine='bs4'):
+    """Saves text strings of xml files into index file which can be
+    used by delocalize() instead of collecting strings every time.
+    Files are parsed one by one and are not kept in memory.
+
+    :param workdir: Work directory where all input
+        xml files are located, or .ftl/.zip mod archive.
+
+    :param index_file: Path of index file.
+
+    :param languages: Languages to save, all SUPPORTED_LANGUAGES
+        and strings without language by default.
+
+    :param engine: 'bs4' or 'lxml', result is the same.
+    """
+    check_workdir(workdir)
+    check_engine(engine)
+    if languages is None:
+        languages = sorted(SUPPORTED_LANGUAGES) + [None]
+    languages = [check_language(lang) for lang in languages]
+    dictionaries = {lang: {} for lang in languages}
+    sources = []
+    print('Started parsing xml files...')
+    with archives_kept_open():
+        filenames = list_xml_files(workdir)
+        needed = set(prescan_files(workdir, filenames, 'delocalize')[0])
+        for filename in filenames:
+            if filename not in needed:
+                # Same record as for a parsed file with no strings and ids
+                sources.append((filename, file_hash(workdir, filename), 0, 0))
+                continue
+            soup = parse_file(workdir, filename, engine)
+            found_strings = find_strings_by_language(soup, languages)
+            addition_counter = 0
+            for lang in languages:
+                dictionaries[lang].update(found_strings[lang])
+                addition_counter += len(found_strings[lang])
+            if addition_counter > 0:
+                print(f'Saved {addition_counter} strings from {filename}...')
+            sources.append(index_source(workdir, filename, soup))
+    write_index(index_file, dictionaries, sources)
+    print(f'Finished writing index file {index_file}...')
+    print('SUCCESS')
 
 
 def delocalize(workdir, outputdir, language_attr, empty_string='TEXT_NOT_FOUND',
-               ignore_continue=True):
+               ignore_continue=True, engine='bs4', workers=1, incremental=False,
+               force_rebuild=False, index_file=None, instrument=None, profile_file=None,
+               low_memory=False, writer_threads=1, fsync=False, baseline_index=None):
     """Makes xml files more convenient to edit by inserting text
     strings from separate text files directly into data files.
 
     :param workdir: Work directory where all input
-        xml files are located.
+        xml files are located, or .ftl/.zip mod archive
+        whose data folder is read without extracting it.
+        A {filename: contents} mapping is read as files in memory.
 
     :param outputdir: Creates a folder with this name
-        and puts all result files there.
+        and puts all result files there. If it ends with .ftl
+        or .zip, a mod archive is written instead: result files go
+        to its data folder, other files of the mod are copied
+        from work directory or archive without recompression.
+        A dict gets result files in memory instead,
+        see localize_files().
 
     :param language_attr: Determines xml attribute "language" which
         will be searched in text files for insertion into data files.
@@ -124,109 +2099,421 @@ def delocalize(workdir, outputdir, language_attr, empty_string='TEXT_NOT_FOUND',
 
     :param ignore_continue: If True, do not replace continue id
         with Continue... text.
-    """
 
-    def append_to_dict(dictionary, string, name):
-        """Append an entry to the dictionary.
-        Returns 1 if string is doubly defined in the dictionary.
-        Dictionary for delocalize() follows structure
-        {id_defined_by_text_attr : localizable_text_string}
-        Reversed structure from localize()
-        """
-        result = 0
-        if string in dictionary:
-            result = 1
-        dictionary[name] = string
-        return result
+    :param engine: 'bs4' parses files with BeautifulSoup,
+        'lxml' uses lighter and faster lxml trees, result is the same.
 
-    def fill_dict(soups, lang):
-        """Populates dictionary with text strings."""
+    :param workers: Number of processes used to parse and write files,
+        result is the same as with one process. On Windows call it
+        under if __name__ == '__main__': when workers > 1.
 
-        def need_to_save_to_dict(tag):
-            """Conditions that can be used by bs4 find_all function."""
-            _result = False
-            if tag.name == 'text':
-                if (tag.string is not None) and ('name' in tag.attrs):
-                    if 'language' in tag.attrs:
-                        _result = tag['language'] == lang
-                    else:
-                        _result = lang is None
-            return _result
+    :param incremental: If True, keeps a manifest in output directory
+        and next time parses only changed files and writes only files
+        whose result is different. Result is the same as full run.
 
-        result = {}
-        for soup in soups:
+    :param force_rebuild: If True, incremental run ignores previous
+        manifest and processes all files.
+
+    :param index_file: Index made by build_index() or localize().
+        If set, text strings are looked up in the index instead of
+        being collected from xml files, each file is written right
+        after parsing, and unchanged files from the index with no text
+        ids are not parsed at all.
+
+    :param instrument: Gets structured events with time of each phase
+        and file, bytes read and written, tag counts and counters of
+        strings: a callable, logging.Logger or path of JSON lines file.
+
+    :param profile_file: If set, phases of the run are profiled with
+        cProfile and stats are saved to this file. Work done by worker
+        processes is not profiled.
+
+    :param low_memory: If True, parsed files are not kept in memory:
+        all files are scanned for text strings and ids one by one,
+        then files with ids are parsed again and written one by one.
+        Peak memory depends on the largest file and the number
+        of strings instead of the size of the whole mod.
+
+    :param writer_threads: Number of threads which write result files
+        while next ones are prepared, 0 writes them right away. Each
+        file is written to a temporary file and renamed when it's
+        complete, so a failed run leaves no partially written files.
+
+    :param fsync: If True, each result file is flushed to disk
+        before it replaces the previous one.
+
+    :param baseline_index: Index file of vanilla text files made by
+        build_index() or batch(). Text ids which are not defined
+        in work directory are looked up in it.
+    """
+
+    def fill_dict(found_strings):
+        """Populates dictionary with text strings,
+        found_strings is a list of (filename, [(name, string)...]).
+        """
+        result = StringTable('id')
+        for filename, entries in found_strings:
             addition_counter = 0
             doubly_defined_counter = 0
-            for text_tag in soup[0].find_all(need_to_save_to_dict):
-                res = append_to_dict(
-                    result, text_tag.string, text_tag['name']
-                )
+            for name, string in entries:
+                res = append_to_localize_dict(result, string, name, filename)
                 doubly_defined_counter += res
                 addition_counter += 1
             if addition_counter > 0:
-                print(f'Saved {addition_counter} strings from {soup[1]}...')
+                print(f'Saved {addition_counter} strings from {filename}...')
+                emit('counter', name='saved', file=filename, value=addition_counter)
             if doubly_defined_counter > 0:
-                print(f'Found {doubly_defined_counter} doubly defined strings in {soup[1]}...')
+                print(f'Found {doubly_defined_counter} doubly defined strings in {filename}...')
+                emit('counter', name='doubly_defined', file=filename,
+                     value=doubly_defined_counter)
         print('Finished filling the dictionary with text strings...')
         return result
 
+    def add_baseline(dictionary):
+        """Dictionary which looks up ids missing in the given one
+        in baseline index, if there is one.
+        """
+        if baseline is None:
+            return dictionary
+        return ChainMap(dictionary, baseline)
+
     def replace_ids_with_texts(soups, dictionary):
         """Locate text ids in bs4 trees and replace them
         with matching text strings from the dictionary.
         """
-
-        def need_to_delocalize(tag):
-            """Conditions that can be used by bs4 find_all function."""
-            result = False
-            if tag.name in ALL_TAGS:
-                if (tag.string is None) and ('id' in tag.attrs):
-                    result = (not ignore_continue) or (tag['id'] != 'continue')
-            return result
-
-        def get_text_string(tag):
-            """Safer function to get value from dictionary."""
-            result = None
-            if 'id' in tag.attrs:
-                if tag['id'] in dictionary:
-                    result = dictionary[tag['id']]
-            return result
-
         for soup in soups:
-            replacement_counter = 0
-            for text_tag in soup[0].find_all(need_to_delocalize):
-                text_string = get_text_string(text_tag)
-                if text_string is not None:
-                    text_tag.string = text_string
-                else:
-                    text_tag.string = empty_string
-                del text_tag['id']
-                replacement_counter += 1
+            text_tags = find_ids_to_delocalize(soup[0], ignore_continue)
+            replace_ids(text_tags, dictionary, empty_string)
+            replacement_counter = len(text_tags)
             if replacement_counter > 0:
-                new_file = open(os.path.join(outputdir, soup[1]), 'w+', encoding='utf-8')
-                new_file.write(pretty_xml(soup[0]))
+                write_xml(soup[0], outputdir, soup[1])
                 print(f'Replaced {replacement_counter} strings in {soup[1]}...')
+                emit('counter', name='replaced', file=soup[1], value=replacement_counter)
         print('Finished replacing ids with text strings...')
 
-    check_dir(workdir)
-    check_and_create_dir(outputdir)
-    language = check_language(language_attr)
-    print('Started parsing xml files...')
-    all_bs4_trees = parse(workdir)
-    locale_dict = fill_dict(all_bs4_trees, language)
-    replace_ids_with_texts(all_bs4_trees, locale_dict)
+    def delocalize_in_phases():
+        """Same as parsing, filling the dictionary and replacing ids
+        but files are first scanned for text strings and ids (by a pool
+        of workers if needed), and parsed again to be written when
+        the dictionary is ready. Trees are not sent between processes.
+        Incremental run takes scans of unchanged files from manifest
+        and writes only files whose text strings have changed.
+        """
+        options = {'mode': 'delocalize', 'language': language,
+                   'empty_string': empty_string, 'ignore_continue': ignore_continue,
+                   'index': index_file is not None}
+        if baseline is not None:
+            options['baseline'] = file_hash(*os.path.split(baseline_index))
+        manifest = None
+        previous_files = {}
+        if incremental:
+            manifest = load_manifest(outputdir, options)
+            if not force_rebuild:
+                previous_files = manifest['files']
+        filenames = list_xml_files(workdir)
+        hashes = {}
+        if incremental:
+            with phase('hash'):
+                hashes = hash_files(workdir, filenames, manifest)
+        to_scan = [filename for filename in filenames
+                   if (filename not in previous_files)
+                   or (previous_files[filename]['hash'] != hashes[filename])]
+        if index_file is not None:
+            locale_dict = StringIndex(index_file, language)
+            # Text strings are not needed, only ids are scanned
+            skipped = [filename for filename in to_scan
+                       if locale_dict.has_no_ids(workdir, filename, ignore_continue)]
+            to_scan = [filename for filename in to_scan if filename not in skipped]
+        to_scan, unneeded = prescan_files(workdir, to_scan, 'delocalize')
+        with phase('scan', files=len(to_scan)):
+            scanned = dict(zip(to_scan, run_scans(
+                scan_file_for_delocalize,
+                [(workdir, filename, engine, language, ignore_continue) for filename in to_scan],
+                workers
+            )))
+        scanned.update((filename, ([], [])) for filename in unneeded)
+        if index_file is not None:
+            scanned.update((filename, ([], [])) for filename in skipped)
+        scans = []
+        for filename in filenames:
+            if filename in scanned:
+                scans.append(scanned[filename])
+            else:
+                scans.append((decode_strings(previous_files[filename]['strings']),
+                              previous_files[filename]['ids']))
+        print('Finished parsing xml files...')
+        if index_file is None:
+            with phase('fill_dict'):
+                locale_dict = fill_dict(zip(filenames, [scan[0] for scan in scans]))
+        files = {}
+        outputs = []
+        tasks = []
+        replaced = []
+        texts_dict = add_baseline(locale_dict)
+        for number, filename in enumerate(filenames):
+            entries, ids = scans[number]
+            # Strings are in the dictionary already and ids are found
+            # again when the file is written, scans don't add up
+            scans[number] = None
+            texts = None
+            if incremental:
+                texts = hashlib.sha256(json.dumps(
+                    encode_strings([texts_dict.get(text_id) for text_id in ids]),
+                    ensure_ascii=False
+                ).encode('utf-8')).hexdigest()
+                if scanned.pop(filename, None) is not None:
+                    strings = encode_strings(entries)
+                else:
+                    strings = previous_files[filename]['strings']
+                files[filename] = {'hash': hashes[filename], 'strings': strings,
+                                   'ids': ids, 'texts': texts, 'written': len(ids) > 0}
+            else:
+                scanned.pop(filename, None)
+            if len(ids) > 0:
+                outputs.append(filename)
+                replaced.append((filename, len(ids)))
+                if is_outdated(previous_files.get(filename), outputdir, filename,
+                               hash=hashes.get(filename), texts=texts):
+                    tasks.append((workdir, outputdir, filename, engine,
+                                  empty_string, ignore_continue))
+        with phase('rewrite', files=len(tasks)):
+            run_tasks(rewrite_file_for_delocalize, tasks, workers, texts_dict)
+        if index_file is not None:
+            locale_dict.close()
+        for filename, count in replaced:
+            print(f'Replaced {count} strings in {filename}...')
+            emit('counter', name='replaced', file=filename, value=count)
+        print('Finished replacing ids with text strings...')
+        if incremental:
+            manifest['files'] = files
+            save_manifest(outputdir, manifest, outputs)
+
+    with instrumented(instrument, profile_file, 'delocalize', language=language_attr,
+                      engine=engine, workers=workers, incremental=incremental):
+        check_workdir(workdir)
+        check_engine(engine)
+        check_workers(outputdir, workers)
+        if incremental:
+            check_incremental_output(outputdir)
+        language = check_language(language_attr)
+        baseline = None
+        if baseline_index is not None:
+            baseline = StringIndex(baseline_index, language)
+        with archives_kept_open(), \
+                output_folder(workdir, outputdir, fsync, workers, low_memory) as outputdir, \
+                output_stage(writer_threads, fsync):
+            print('Started parsing xml files...')
+            if (workers > 1) or incremental or low_memory or \
+                    (current_parse_cache.get() is not None):
+                delocalize_in_phases()
+            elif index_file is not None:
+                # Trees are parsed lazily and dropped after writing
+                locale_dict = StringIndex(index_file, language)
+                filenames = [filename for filename in list_xml_files(workdir)
+                             if not locale_dict.has_no_ids(workdir, filename, ignore_continue)]
+                filenames = prescan_files(workdir, filenames, 'delocalize')[0]
+                with phase('parse_and_replace'):
+                    replace_ids_with_texts(([parse_file(workdir, filename, engine), filename]
+                                            for filename in filenames), add_baseline(locale_dict))
+                locale_dict.close()
+            else:
+                filenames = prescan_files(workdir, list_xml_files(workdir), 'delocalize')[0]
+                with phase('parse'):
+                    all_bs4_trees = parse(workdir, engine, filenames)
+                with phase('fill_dict'):
+                    locale_dict = fill_dict([(soup[1], find_language_strings(soup[0], language))
+                                             for soup in all_bs4_trees])
+                with phase('replace'):
+                    replace_ids_with_texts(all_bs4_trees, add_baseline(locale_dict))
+        if baseline is not None:
+            baseline.close()
+        print('SUCCESS')
+
+
+def delocalize_all(workdir, outputdir, languages=None, empty_string='TEXT_NOT_FOUND',
+                   ignore_continue=True, engine='bs4', writer_threads=1, fsync=False):
+    """Same as delocalize() for each language with a subfolder of
+    outputdir named after the language as output directory, but files
+    are parsed once and text strings of all languages are collected
+    in one pass.
+
+    :param languages: Languages to delocalize,
+        all SUPPORTED_LANGUAGES by default.
+
+    Other parameters are the same as in delocalize().
+
+    Returns {language: number of text ids with no text string found}.
+    """
+
+    def fill_dicts(found_strings):
+        """Populates a dictionary for each language,
+        found_strings is a list of {language: [(name, string)...]}.
+        """
+        result = {lang: StringTable('id') for lang in languages}
+        for entries in found_strings:
+            for lang in languages:
+                for name, string in entries[lang]:
+                    result[lang].add(string, name)
+        for lang in languages:
+            print(f'Saved {len(result[lang])} strings for {lang}...')
+        print('Finished filling the dictionaries with text strings...')
+        return result
+
+    def replace_ids_for_language(soups, text_tags, lang, dictionary):
+        """Replace text ids with text strings of one language, write
+        changed files and put the ids back for the next language.
+        Returns number of ids with no text string found.
+        """
+        langdir = lang if lang is not None else 'misc'
+        if not in_memory(outputdir):
+            check_and_create_dir(os.path.join(outputdir, langdir))
+        replacement_counter = 0
+        missing_counter = 0
+        for soup, tags in zip(soups, text_tags):
+            if not tags:
+                continue
+            ids = [tag['id'] for tag in tags]
+            missing_counter += sum(1 for text_id in ids if text_id not in dictionary)
+            replace_ids(tags, dictionary, empty_string)
+            write_xml(soup[0], outputdir, os.path.join(langdir, soup[1]))
+            for tag, text_id in zip(tags, ids):
+                tag['id'] = text_id
+            replacement_counter += len(tags)
+        print(f'Replaced {replacement_counter} strings for {lang}, '
+              f'{missing_counter} not found...')
+        return missing_counter
+
+    check_workdir(workdir)
+    check_engine(engine)
+    if is_archive(outputdir):
+        raise Exception('Output of delocalize_all has a folder for each language, not archive')
+    if not in_memory(outputdir):
+        check_and_create_dir(outputdir)
+    if languages is None:
+        languages = sorted(SUPPORTED_LANGUAGES)
+    languages = [check_language(lang) for lang in languages]
+    with output_stage(writer_threads, fsync):
+        print('Started parsing xml files...')
+        filenames = prescan_files(workdir, list_xml_files(workdir), 'delocalize')[0]
+        all_bs4_trees = parse(workdir, engine, filenames)
+        dictionaries = fill_dicts([find_strings_by_language(soup[0], languages)
+                                   for soup in all_bs4_trees])
+        all_text_tags = [find_ids_to_delocalize(soup[0], ignore_continue)
+                         for soup in all_bs4_trees]
+        missing = {}
+        for lang in languages:
+            missing[lang] = replace_ids_for_language(all_bs4_trees, all_text_tags,
+                                                     lang, dictionaries[lang])
+    print('Finished replacing ids with text strings...')
     print('SUCCESS')
+    return missing
+
+
+def append_to_localize_dict(dictionary, string, name, source):
+    """Append an entry to the dictionary.
+    Returns 1 if string is doubly defined in the dictionary.
+    Dictionary for localize() is a StringTable with structure
+    {localizable_text_string : id_defined_by_text_attr},
+    delocalize() fills one with reversed structure.
+    """
+    result = 0
+    if string in dictionary:
+        result = 1
+    dictionary.add(string, name, source)
+    return result
+
 
+def fill_localize_dict(found_strings):
+    """Populates dictionary with text strings that are already
+    defined in text files,
+    found_strings is a list of (filename, [(string, name)...]).
+    Strings of BASELINE_SOURCE are counted apart from the ones
+    of the mod.
+    """
+    result = StringTable()
+    for filename, entries in found_strings:
+        addition_counter = 0
+        doubly_defined_counter = 0
+        for string, name in entries:
+            res = append_to_localize_dict(result, string, name, filename)
+            doubly_defined_counter += res
+            addition_counter += 1
+        prefix = 'baseline_' if filename == BASELINE_SOURCE else ''
+        if addition_counter > 0:
+            print(f'Copied {addition_counter} strings from {filename}...')
+            emit('counter', name=f'{prefix}copied_defined', file=filename,
+                 value=addition_counter)
+        if doubly_defined_counter > 0:
+            print(f'Found {doubly_defined_counter} doubly defined strings in {filename}...')
+            emit('counter', name=f'{prefix}doubly_defined', file=filename,
+                 value=doubly_defined_counter)
+    print('Finished copying already localized text...')
+    return result
+
+
+def assign_ids(records, dictionary, source, check_same_strings):
+    """Assign ids to text strings found in one file
+    and add new strings to the dictionary, same strings get
+    the same id if check_same_strings is True.
+    Returns list of ids matching records (None if tag is
+    left as is) and True if there are any changes.
+    """
+
+    ids = []
+    detached = []
+    repeat_counter = 0
+    addition_counter = 0
+    for string, text_id, nested_in in records:
+        is_detached = (nested_in is not None) and \
+            ((ids[nested_in] is not None) or detached[nested_in])
+        if is_detached:
+            # Tag was removed from tree together with localized parent
+            text_id = None
+        existing_id = None
+        if check_same_strings:
+            # Trying to find existing id with exact string match
+            existing_id = dictionary.get(string)
+        if existing_id is None:
+            # Assigning new id
+            if text_id is not None:
+                append_to_localize_dict(dictionary, string, text_id, source)
+                addition_counter += 1
+            ids.append(text_id)
+        else:
+            # Found repeating string, don't generate new id
+            ids.append(existing_id)
+            repeat_counter += 1
+        detached.append(is_detached)
+    if addition_counter > 0:
+        print(f'Copied {addition_counter} strings from {source}...')
+        emit('counter', name='copied', file=source, value=addition_counter)
+    if repeat_counter > 0:
+        print(f'Found {repeat_counter} repeats in {source}...')
+        emit('counter', name='repeats', file=source, value=repeat_counter)
+    return ids, (addition_counter > 0) or (repeat_counter > 0)
 
-def localize(workdir, outputdir, language_attr, check_same_strings=False, split_result=False):
+
+def localize(workdir, outputdir, language_attr, check_same_strings=False, split_result=False,
+             engine='bs4', workers=1, incremental=False, force_rebuild=False,
+             split_files=SPLIT_RESULT_FILES, index_file=None, instrument=None,
+             profile_file=None, low_memory=False, writer_threads=1, fsync=False,
+             baseline_index=None):
     """Prepares xml files for localization by moving all text
     strings from data files into separate text files which
     can be different for each language.
 
     :param workdir: Work directory where all input xml
-        files are located.
+        files are located, or .ftl/.zip mod archive
+        whose data folder is read without extracting it.
+        A {filename: contents} mapping is read as files in memory.
 
     :param outputdir: Creates a folder with this name
-        and puts all result files there.
+        and puts all result files there. If it ends with .ftl
+        or .zip, a mod archive is written instead: result files go
+        to its data folder, other files of the mod are copied
+        from work directory or archive without recompression.
+        A dict gets result files in memory instead,
+        see localize_files().
 
     :param language_attr: Determines xml attribute "language"
         in result localization file.
@@ -237,41 +2524,94 @@ def localize(workdir, outputdir, language_attr, check_same_strings=False, split_
     :param split_result: If False, all files with text strings
         will be combined, otherwise, files will be split into
         categories based on source file.
+
+    :param engine: 'bs4' parses files with BeautifulSoup,
+        'lxml' uses lighter and faster lxml trees, result is the same.
+
+    :param workers: Number of processes used to parse and write files,
+        result is the same as with one process. On Windows call it
+        under if __name__ == '__main__': when workers > 1.
+
+    :param incremental: If True, keeps a manifest in output directory
+        and next time parses only changed files and writes only files
+        whose text ids are different. Result is the same as full run.
+
+    :param force_rebuild: If True, incremental run ignores previous
+        manifest and processes all files.
+
+    :param split_files: List of (result file name, source) pairs used
+        when split_result is True. Strings go to the first file whose
+        source is a part of their source file name, None matches any file.
+
+    :param index_file: If set, strings of result text files are also
+        saved to this index file for delocalize(), same as build_index()
+        of these files would do.
+
+    :param instrument: Gets structured events with time of each phase
+        and file, bytes read and written, tag counts and counters of
+        strings: a callable, logging.Logger or path of JSON lines file.
+
+    :param profile_file: If set, phases of the run are profiled with
+        cProfile and stats are saved to this file. Work done by worker
+        processes is not profiled.
+
+    :param low_memory: If True, parsed files are not kept in memory:
+        all files are scanned for text strings one by one, then files
+        with new ids are parsed again and written one by one.
+        Peak memory depends on the largest file and the number
+        of strings instead of the size of the whole mod.
+
+    :param writer_threads: Number of threads which write result files
+        while next ones are prepared, 0 writes them right away. Each
+        file is written to a temporary file and renamed when it's
+        complete, so a failed run leaves no partially written files.
+
+    :param fsync: If True, each result file is flushed to disk
+        before it replaces the previous one.
+
+    :param baseline_index: Index file of vanilla text files made by
+        build_index() or batch(). With check_same_strings, strings
+        which are already there keep their vanilla ids and are not
+        written to result text files. Without check_same_strings
+        the index is not read.
     """
+    localize_all(workdir, outputdir, [language_attr], check_same_strings, split_result,
+                 engine, workers, incremental, force_rebuild, split_files, index_file,
+                 instrument, profile_file, low_memory, writer_threads, fsync, baseline_index)
 
-    def append_to_dict(dictionary, string, name, source):
-        """Append an entry to the dictionary.
-        Returns 1 if string is doubly defined in the dictionary.
-        Dictionary for localize() follows structure
-        {localizable_text_string : id_defined_by_text_attr}
-        Reversed structure from delocalize()
-        """
-        result = 0
-        if string in dictionary:
-            result = 1
-        dictionary[string] = [name, source]
-        return result
 
-    def fill_dict(soups):
-        """Populates dictionary with text strings that are already
-        defined in text files.
+def localize_all(workdir, outputdir, languages=None, check_same_strings=False,
+                 split_result=False, engine='bs4', workers=1, incremental=False,
+                 force_rebuild=False, split_files=SPLIT_RESULT_FILES, index_file=None,
+                 instrument=None, profile_file=None, low_memory=False, writer_threads=1,
+                 fsync=False, baseline_index=None):
+    """Same as localize() but files are parsed once and result text
+    files are written for every language. Data files do not depend
+    on language and are written once.
+
+    :param languages: Languages of result text files,
+        all SUPPORTED_LANGUAGES by default. Each language gets its own
+        text-<language>.xml, or a subfolder named after the language
+        with split result files if there are several languages.
+
+    Other parameters are the same as in localize().
+    """
+
+    def fill_dict(found_strings):
+        """Same as fill_localize_dict() but strings without language
+        from baseline index, if there is one, go first. Baseline is
+        used only to find same strings, so without check_same_strings
+        it is not read and its strings are not counted as doubly defined.
         """
-        result = {}
-        for soup in soups:
-            addition_counter = 0
-            doubly_defined_counter = 0
-            for text_tag in soup[0].find_all('text'):
-                if text_tag.string is not None:
-                    if 'name' in text_tag.attrs:
-                        res = append_to_dict(result, text_tag.string, text_tag['name'], soup[1])
-                        doubly_defined_counter += res
-                        addition_counter += 1
-            if addition_counter > 0:
-                print(f'Copied {addition_counter} strings from {soup[1]}...')
-            if doubly_defined_counter > 0:
-                print(f'Found {doubly_defined_counter} doubly defined strings in {soup[1]}...')
-        print('Finished copying already localized text...')
-        return result
+        if (baseline_index is None) or not check_same_strings:
+            return fill_localize_dict(found_strings)
+        baseline = StringIndex(baseline_index, None)
+        try:
+            baseline_strings = [(string, name) for name, string in baseline.items()]
+        finally:
+            baseline.close()
+        return fill_localize_dict(itertools.chain([(BASELINE_SOURCE, baseline_strings)],
+                                                  found_strings))
 
     def copy_new_ids(soups, dictionary):
         """Find text strings that need to be localized in bs4 trees,
@@ -280,181 +2620,773 @@ def localize(workdir, outputdir, language_attr, check_same_strings=False, split_
         using newly assigned id,
         create new xml files if there are any changes.
         """
+        for soup in soups:
+            tags, records = find_strings_to_localize(soup[0])
+            ids, changed = assign_ids(records, dictionary, soup[1], check_same_strings)
+            set_text_ids(tags, ids)
+            if changed:
+                write_xml(soup[0], outputdir, soup[1])
+        print('Finished copying new text...')
 
-        def get_textid(tag):
-            """Check if there is a need to localize tag and
-            get a short (and hopefully unique) id for text tag,
-            keeps names as close to vanilla as possible
-            """
-
-            def get_sibling_number(_tag):
-                """Get order number of tag counting only
-                sibling tags with same name
-                """
-                _result = '1'
-                before = 0
-                prevtag = _tag.previous_sibling
-                while prevtag is not None:
-                    if prevtag.name == _tag.name:
-                        before += 1
-                    prevtag = prevtag.previous_sibling
-                if before > 0:
-                    _result = str(before + 1)
-                return _result
-
-            def get_child_str(parents):
-                """Forms text ids from parent tags following structure
-                c1_c2_c1_c10...
-                """
-                _result = ''
-                for parent_tag in reversed(parents[:-1]):
-                    if parent_tag.name == 'choice':
-                        _result = f'{_result}_c{get_sibling_number(parent_tag)}'
-                if parents[0].name in PARENT_TAG_DICT:
-                    _result = f'{_result}_{PARENT_TAG_DICT[parents[0].name]}'
+    def localize_in_phases():
+        """Same as parsing, filling the dictionary and copying new ids
+        but files are first scanned for text strings (by a pool of
+        workers if needed). Ids are assigned in this process in the same
+        order as in a single process run, then files are parsed again
+        and written. Incremental run takes scans of unchanged files
+        from manifest and writes only files whose ids have changed.
+        Returns the dictionary, manifest file entries and written files.
+        """
+        previous_files = {}
+        if incremental and not force_rebuild:
+            previous_files = manifest['files']
+        filenames = list_xml_files(workdir)
+        hashes = {}
+        if incremental:
+            with phase('hash'):
+                hashes = hash_files(workdir, filenames, manifest)
+        to_scan = [filename for filename in filenames
+                   if (filename not in previous_files)
+                   or (previous_files[filename]['hash'] != hashes[filename])]
+        to_scan, unneeded = prescan_files(workdir, to_scan, 'localize')
+        with phase('scan', files=len(to_scan)):
+            scanned = dict(zip(to_scan, run_scans(
+                scan_file_for_localize,
+                [(workdir, filename, engine) for filename in to_scan],
+                workers
+            )))
+        scanned.update((filename, ([], [])) for filename in unneeded)
+        scans = []
+        for filename in filenames:
+            if filename in scanned:
+                scans.append(scanned[filename])
+            else:
+                scans.append((decode_strings(previous_files[filename]['strings']),
+                              decode_strings(previous_files[filename]['records'])))
+        print('Finished parsing xml files...')
+        with phase('fill_dict'):
+            dictionary = fill_dict(zip(filenames, [scan[0] for scan in scans]))
+        files = {}
+        outputs = []
+        tasks = []
+        with phase('assign_ids'):
+            for number, filename in enumerate(filenames):
+                entries, records = scans[number]
+                # Only ids are kept for rewriting, so memory of scans
+                # doesn't add up over all files
+                scans[number] = None
+                ids, changed = assign_ids(records, dictionary, filename,
+                                          check_same_strings)
+                if incremental:
+                    if scanned.pop(filename, None) is not None:
+                        strings = encode_strings(entries)
+                        encoded_records = encode_strings(records)
+                    else:
+                        # Already encoded in previous manifest
+                        strings = previous_files[filename]['strings']
+                        encoded_records = previous_files[filename]['records']
+                    files[filename] = {'hash': hashes[filename], 'strings': strings,
+                                       'records': encoded_records, 'ids': ids,
+                                       'written': changed}
                 else:
-                    _result = f'{_result}_{parents[0].name}'
-                return _result
+                    scanned.pop(filename, None)
+                if changed:
+                    outputs.append(filename)
+                    if is_outdated(previous_files.get(filename), outputdir, filename,
+                                   hash=hashes.get(filename), ids=ids):
+                        tasks.append((workdir, outputdir, filename, engine, ids))
+        with phase('rewrite', files=len(tasks)):
+            run_tasks(rewrite_file_for_localize, tasks, workers)
+        print('Finished copying new text...')
+        return dictionary, files, outputs
 
-            def get_attr(_tag):
-                """Safer function to get attribute."""
-                if 'name' in _tag.attrs:
-                    return f'_{_tag["name"]}'
+    def locale_file_out(entries, filename, lang):
+        """Creates xml file with (string, name) entries."""
+        start = time.perf_counter()
+        data = text_bytes(write_pieces, iter_locale_pieces(entries, lang))
+        write_output(outputdir, filename, data)
+        print(f'Finished creating result file {filename}...')
+        if current_instrument.get() is not None:
+            emit('file', phase='write', file=filename, strings=len(entries),
+                 seconds=round(time.perf_counter() - start, 6), bytes_written=len(data))
+
+    def write_locale_files(dictionary, languages):
+        """Creates result text files for all languages, strings are
+        split the same way for all of them. Incremental run writes
+        only files whose entries have changed.
+        Returns names of the files.
+        """
+        previous_locales = {}
+        if incremental and not force_rebuild:
+            previous_locales = manifest.get('locales', {})
+        if split_result:
+            buckets = split_entries(dictionary, split_files)
+        else:
+            buckets = split_entries(dictionary, [(None, None)])
+        result = []
+        for language in languages:
+            if split_result:
+                subdir = ''
+                if len(languages) > 1:
+                    subdir = language if language is not None else 'misc'
+                    if not in_memory(outputdir):
+                        check_and_create_dir(os.path.join(outputdir, subdir))
+                locale_files = [(os.path.join(subdir, name), source)
+                                for name, source in split_files]
+            else:
+                if language is not None:
+                    locale_files = [(f'text-{language}.xml', None)]
                 else:
-                    return ''
-
-            result = None
-            parent_list = list(tag.parents)
-            if len(parent_list) > 2:
-                parent_top = parent_list[-3]
-                if (tag.name == 'text') and ('name' not in tag.attrs):
-                    if parent_top.name == 'textList':
-                        result = f'text{get_attr(parent_top)}_{get_sibling_number(tag)}'
-                    elif parent_top.name == 'event':
-                        result = f'event{get_attr(parent_top)}{get_child_str(parent_list[:-2])}'
-                    elif parent_top.name == 'eventList':
-                        result = f'event{get_attr(parent_top)}_' \
-                                 f'{get_sibling_number(parent_list[-4])}' \
-                                 f'{get_child_str(parent_list[:-3])}'
-                    elif parent_top.name == 'ship':
-                        result = f'ship{get_attr(parent_top)}_{parent_list[-4].name}' \
-                                 f'{get_child_str(parent_list[:-3])}'
-                elif tag.name in BLUEPRINT_TAGS:
-                    if parent_top.name[-9:] == 'Blueprint':
-                        result = f'{parent_top.name[:-9]}{get_attr(parent_top)}_{tag.name}'
-                elif tag.name == 'name':
-                    if parent_top.name == 'shipBlueprint':
-                        result = f'{parent_top.name[:-9]}{get_attr(parent_top)}_{tag.name}'
-                elif tag.name == 'power':
-                    if parent_top.name == 'crewBlueprint' and parent_list[0].name == 'powerList':
-                        result = f'{parent_top.name[:-9]}{get_attr(parent_top)}_{tag.name}' \
-                                 f'{get_sibling_number(tag)}'
-                elif tag.name == 'crewMember':
-                    result = f'name_crewMember_{tag.string}'
-            return result
+                    locale_files = [('text_misc.xml', None)]
+            for (locale_file_name, _), entries in zip(locale_files, buckets):
+                if incremental:
+                    digest = hashlib.sha256(json.dumps(
+                        [language, encode_strings(entries)], ensure_ascii=False
+                    ).encode('utf-8')).hexdigest()
+                    locales[locale_file_name] = {'entries': digest, 'written': True}
+                    if not is_outdated(previous_locales.get(locale_file_name), outputdir,
+                                       locale_file_name, entries=digest):
+                        result.append(locale_file_name)
+                        continue
+                locale_file_out(entries, locale_file_name, language)
+                result.append(locale_file_name)
+        return result
 
-        def need_to_localize(tag):
-            """Conditions that can be used by bs4 find_all function."""
-            result = False
-            if tag.name in ALL_TAGS:
-                if (tag.string is not None) and (not tag.string.isdigit()):
-                    result = (tag.name != 'text') or ('name' not in tag.attrs)
-            return result
+    def write_locale_index(filenames, languages):
+        """Saves strings of result text files to index file,
+        they are read back the same way delocalize() reads them.
+        """
+        dictionaries = {language: {} for language in languages}
+        sources = []
+        flush_output()
+        for filename in filenames:
+            soup = parse_file(outputdir, filename, engine)
+            found_strings = find_strings_by_language(soup, languages)
+            for language in languages:
+                dictionaries[language].update(found_strings[language])
+            sources.append(index_source(outputdir, filename, soup))
+        write_index(index_file, dictionaries, sources)
+        print(f'Finished writing index file {index_file}...')
 
-        def get_existing_id(tag):
-            """Trying to find existing id with
-            exact string match in the dictionary
-            """
-            result = None
-            if tag.string in dictionary:
-                result = dictionary[tag.string][0]
-            return result
+    # Main
+    with instrumented(instrument, profile_file, 'localize', languages=languages,
+                      engine=engine, workers=workers, incremental=incremental):
+        check_workdir(workdir)
+        check_engine(engine)
+        check_workers(outputdir, workers)
+        if incremental:
+            check_incremental_output(outputdir)
+        if languages is None:
+            languages = sorted(SUPPORTED_LANGUAGES)
+        languages = [check_language(lang) for lang in languages]
+        if split_result:
+            check_split_files(split_files)
+        with archives_kept_open(), \
+                output_folder(workdir, outputdir, fsync, workers, low_memory) as outputdir, \
+                output_stage(writer_threads, fsync):
+            if incremental:
+                split_options = [list(pair) for pair in split_files] if split_result else None
+                options = {'mode': 'localize', 'languages': languages,
+                           'check_same_strings': check_same_strings,
+                           'split_result': split_result, 'split_files': split_options}
+                if (baseline_index is not None) and check_same_strings:
+                    options['baseline'] = file_hash(*os.path.split(baseline_index))
+                manifest = load_manifest(outputdir, options)
+            # Digests of result text files written by incremental run
+            locales = {}
+            print('Started parsing xml files...')
+            if (workers > 1) or incremental or low_memory or \
+                    (current_parse_cache.get() is not None):
+                locale_dict, manifest_files, outputs = localize_in_phases()
+            else:
+                filenames = prescan_files(workdir, list_xml_files(workdir), 'localize')[0]
+                with phase('parse'):
+                    all_bs4_trees = parse(workdir, engine, filenames)
+                with phase('fill_dict'):
+                    locale_dict = fill_dict([(soup[1], find_defined_strings(soup[0]))
+                                             for soup in all_bs4_trees])
+                with phase('copy_ids'):
+                    copy_new_ids(all_bs4_trees, locale_dict)
+            with phase('locale_files'):
+                locale_names = write_locale_files(locale_dict, languages)
+            if index_file is not None:
+                with phase('index'):
+                    write_locale_index(locale_names, languages)
+            if incremental:
+                manifest['files'] = manifest_files
+                manifest['locales'] = locales
+                save_manifest(outputdir, manifest, outputs + locale_names)
+        print('SUCCESS')
 
-        for soup in soups:
-            repeat_counter = 0
-            addition_counter = 0
-            for text_tag in soup[0].find_all(need_to_localize):
-                existing_id = None
-                if check_same_strings:
-                    existing_id = get_existing_id(text_tag)
-                if existing_id is None:
-                    # Assigning new id
-                    text_id = get_textid(text_tag)
-                    if text_id is not None:
-                        append_to_dict(dictionary, text_tag.string, text_id, soup[1])
-                        text_tag.contents = []
-                        text_tag['id'] = text_id
-                        addition_counter += 1
-                else:
-                    # Found repeating string, don't generate new id
-                    text_tag.contents = []
-                    text_tag['id'] = existing_id
-                    repeat_counter += 1
-            if (addition_counter > 0) or (repeat_counter > 0):
-                new_file = open(os.path.join(outputdir, soup[1]), 'w+', encoding='utf-8')
-                new_file.write(pretty_xml(soup[0]))
-            if addition_counter > 0:
-                print(f'Copied {addition_counter} strings from {soup[1]}...')
-            if repeat_counter > 0:
-                print(f'Found {repeat_counter} repeats in {soup[1]}...')
-        print('Finished copying new text...')
 
-    def locale_file_out(dictionary, filename, source, lang):
-        """Creates xml file using data from dictionary with strings
-        from matching source.
-        """
+def localize_dictionary(workdir, check_same_strings=False, engine='bs4', workers=1):
+    """Dictionary that localize() makes for result text files of
+    a mod, without writing any files. Files are parsed one by one
+    (by a pool of workers if needed) and are not kept in memory.
+    """
+    with archives_kept_open():
+        filenames = list_xml_files(workdir)
+        to_scan, unneeded = prescan_files(workdir, filenames, 'localize')
+        scanned = dict(zip(to_scan, run_scans(scan_file_for_localize,
+                                              [(workdir, filename, engine)
+                                               for filename in to_scan],
+                                              workers)))
+    scanned.update((filename, ([], [])) for filename in unneeded)
+    dictionary = fill_localize_dict((filename, scanned[filename][0]) for filename in filenames)
+    for filename in filenames:
+        assign_ids(scanned[filename][1], dictionary, filename, check_same_strings)
+    return dictionary
 
-        def create_locale_tree():
-            """Creates a new bs4 tree.
-            Caution: outed strings are deleted from dictionary.
-            """
-
-            def append_new_tag(tree, string, name):
-                """Append a tag to bs4 tree"""
-                new_tag = tree.new_tag('text')
-                new_tag.string = string
-                new_tag['name'] = name
-                if lang is not None:
-                    new_tag['language'] = lang
-                new_tree_root.append(new_tag)
-
-            new_tree = BeautifulSoup(EMPTY_XML, "lxml-xml")
-            new_tree_root = new_tree.find('FTL')
-            dict_for_delete = {}
-            for entry in dictionary:
-                if (source is None) or (source in dictionary[entry][1]):
-                    append_new_tag(new_tree, entry, dictionary[entry][0])
-                    dict_for_delete[entry] = []
-            for entry in dict_for_delete:
-                del dictionary[entry]
-            return new_tree
-
-        locale_file = open(os.path.join(outputdir, filename), 'w+', encoding='utf-8')
-        locale_file.write(pretty_xml(create_locale_tree()))
-        print(f'Finished creating result file {filename}...')
 
-    # Main
-    check_dir(workdir)
-    check_and_create_dir(outputdir)
-    language = check_language(language_attr)
-    print('Started parsing xml files...')
-    all_bs4_trees = parse(workdir)
-    locale_dict = fill_dict(all_bs4_trees)
-    copy_new_ids(all_bs4_trees, locale_dict)
-
-    # Creating result file(s)
-    if split_result:
-        locale_file_out(locale_dict, 'text_events.xml.append', 'event', language)
-        locale_file_out(locale_dict, 'text_blueprints.xml.append', 'blueprint', language)
-        locale_file_out(locale_dict, 'text_achievements.xml.append', 'achievement', language)
-        locale_file_out(locale_dict, 'text_sectorname.xml.append', 'sector', language)
-        locale_file_out(locale_dict, 'text_tooltips.xml.append', 'tooltip', language)
-        locale_file_out(locale_dict, 'text_tutorial.xml.append', 'tutorial', language)
-        locale_file_out(locale_dict, 'text_misc.xml.append', None, language)
+def manifest_dictionary(manifest_file, check_same_strings=False):
+    """Same as localize_dictionary() for the files of incremental
+    localize() run, rebuilt from its manifest without reading them.
+    """
+    with open(manifest_file, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    if (manifest.get('version') != MANIFEST_VERSION) or \
+            (manifest.get('options', {}).get('mode') != 'localize'):
+        raise Exception(f'{manifest_file} is not a manifest of incremental localize run')
+    if manifest['options']['check_same_strings'] != check_same_strings:
+        raise Exception('Manifest was made with other check_same_strings option')
+    files = manifest['files']
+    dictionary = fill_localize_dict((filename, decode_strings(entry['strings']))
+                                    for filename, entry in files.items())
+    for filename, entry in files.items():
+        assign_ids(decode_strings(entry['records']), dictionary, filename, check_same_strings)
+    return dictionary
+
+
+def string_index(dictionary):
+    """Hash index of localize dictionary by id,
+    {name: [strings with this name]}, strings are encoded
+    by encode_strings() so that their types are compared too.
+    """
+    result = {}
+    for string, name, _ in dictionary.entries():
+        result.setdefault(name, []).append(encode_strings(string))
+    return result
+
+
+def delta(old_workdir, workdir, outputdir, languages=None, check_same_strings=False,
+          engine='bs4', workers=1, writer_threads=1, fsync=False):
+    """Writes only text strings which were added or changed since
+    previous version of the mod, so translators don't need to go
+    through the whole text file again. Strings are the ones localize()
+    puts to result text file, ids of both versions are looked up
+    in hash indexes instead of comparing the trees.
+
+    :param old_workdir: Previous version of the mod: work directory,
+        mod archive, or manifest file which incremental localize()
+        keeps in output directory, then old files are not read.
+
+    :param workdir: New version of the mod: work directory
+        or mod archive.
+
+    :param outputdir: Creates a folder with this name and puts
+        text-<language>.xml.append with added and changed strings
+        of each language there.
+
+    :param languages: Languages of result patch files,
+        all SUPPORTED_LANGUAGES by default.
+
+    Other parameters are the same as in localize().
+
+    Returns {'added': [ids], 'changed': [ids], 'removed': [ids]}.
+    """
+    check_workdir(workdir)
+    check_engine(engine)
+    if is_archive(outputdir):
+        raise Exception('Output of delta is a folder of patch files, not archive')
+    if languages is None:
+        languages = sorted(SUPPORTED_LANGUAGES)
+    languages = [check_language(lang) for lang in languages]
+    print('Started reading previous version...')
+    if not in_memory(old_workdir) and os.path.isfile(old_workdir) and not is_archive(old_workdir):
+        old_index = string_index(manifest_dictionary(old_workdir, check_same_strings))
     else:
-        if language is not None:
-            locale_file_name = f'text-{language}.xml'
+        check_workdir(old_workdir)
+        old_index = string_index(localize_dictionary(old_workdir, check_same_strings,
+                                                     engine, workers))
+    print('Started reading new version...')
+    dictionary = localize_dictionary(workdir, check_same_strings, engine, workers)
+    new_index = string_index(dictionary)
+    added = [name for name in new_index if name not in old_index]
+    changed = [name for name in new_index
+               if (name in old_index) and (old_index[name] != new_index[name])]
+    removed = [name for name in old_index if name not in new_index]
+    print(f'Found {len(added)} added, {len(changed)} changed '
+          f'and {len(removed)} removed strings...')
+    names = set(added).union(changed)
+    entries = [(string, name) for string, name, _ in dictionary.entries() if name in names]
+    if not in_memory(outputdir):
+        check_and_create_dir(outputdir)
+    with output_stage(writer_threads, fsync):
+        for language in languages:
+            if language is not None:
+                filename = f'text-{language}.xml.append'
+            else:
+                filename = 'text_misc.xml.append'
+            write_output(outputdir, filename,
+                         text_bytes(write_pieces, iter_locale_pieces(entries, language)))
+            print(f'Finished creating patch file {filename}...')
+    print('SUCCESS')
+    return {'added': added, 'changed': changed, 'removed': removed}
+
+
+def write_report_csv(report, file):
+    """Writes coverage report as CSV rows: type of row, language, id,
+    files separated by ; and numbers of defined and expected strings
+    for coverage rows.
+    """
+    writer = csv.writer(file, lineterminator='\n')
+    writer.writerow(['type', 'language', 'id', 'files', 'defined', 'expected'])
+    for lang, result in report['languages'].items():
+        writer.writerow(['coverage', lang, '', '', result['defined'], result['expected']])
+        writer.writerows(['missing', lang, text_id, '', '', ''] for text_id in result['missing'])
+        writer.writerows(['orphaned', lang, text_id, '', '', '']
+                         for text_id in result['orphaned'])
+    for duplicate in report['duplicates']:
+        writer.writerow(['duplicate', duplicate['language'] or '', duplicate['id'],
+                         ';'.join(duplicate['files']), '', ''])
+    for undefined in report['undefined']:
+        writer.writerow(['undefined', '', undefined['id'], ';'.join(undefined['files']), '', ''])
+
+
+def coverage_report(workdir, report_file=None, languages=None, report_format=None,
+                    ignore_continue=True, engine='bs4', workers=1, baseline_index=None):
+    """Checks text strings of every language without writing any data
+    files. Files are parsed once and only names of defined strings
+    and text ids are collected, so it is much faster than delocalize()
+    for each language.
+
+    :param workdir: Work directory, mod archive or files in memory,
+        same as in delocalize().
+
+    :param report_file: If set, report is saved to this file.
+
+    :param languages: Languages to check, all SUPPORTED_LANGUAGES
+        by default. Strings without language are the ones expected
+        to be translated.
+
+    :param report_format: 'json' or 'csv', by default 'csv' if
+        report_file ends with .csv and 'json' otherwise.
+
+    :param baseline_index: Index file of vanilla text files made by
+        build_index() or batch(). Its strings count as defined.
+
+    Other parameters are the same as in delocalize().
+
+    Returns report dictionary:
+    'languages': {language: numbers of 'defined' and 'expected'
+    strings, 'coverage', 'missing' ids which are defined without
+    language or used in data files but not defined for the language,
+    'orphaned' ids which are defined only for the language and not
+    used}, 'duplicates': ids defined more than once for the same
+    language with their files, 'undefined': ids used in data files
+    and not defined for any language with files using them.
+    """
+    check_workdir(workdir)
+    check_engine(engine)
+    if languages is None:
+        languages = sorted(SUPPORTED_LANGUAGES)
+    languages = [lang for lang in map(check_language, languages) if lang is not None]
+    if report_format is None:
+        csv_file = (report_file is not None) and report_file.lower().endswith('.csv')
+        report_format = 'csv' if csv_file else 'json'
+    if report_format not in REPORT_FORMATS:
+        raise Exception(f'Report format must be one of {sorted(REPORT_FORMATS)}')
+    print('Started parsing xml files...')
+    with archives_kept_open():
+        filenames = list_xml_files(workdir)
+        to_scan = prescan_files(workdir, filenames, 'delocalize')[0]
+        with phase('scan', files=len(to_scan)):
+            scans = run_scans(scan_file_for_report,
+                              [(workdir, filename, engine, ignore_continue)
+                               for filename in to_scan],
+                              workers)
+    print('Finished parsing xml files...')
+    # {language: {name: [files]}}, None is strings without language
+    defined = {lang: {} for lang in [None] + languages}
+    # {text id: {file: None}} of data files using it
+    references = {}
+    for filename, (definitions, ids) in zip(to_scan, scans):
+        for lang, name in definitions:
+            if lang in defined:
+                defined[lang].setdefault(name, []).append(filename)
+        for text_id in ids:
+            references.setdefault(text_id, {})[filename] = None
+    baselines = {}
+    if baseline_index is not None:
+        baselines = {lang: StringIndex(baseline_index, lang) for lang in defined}
+
+    def is_defined(text_id, lang):
+        """Checks if text id is defined for language in the mod or baseline."""
+        return (text_id in defined[lang]) or \
+            ((lang in baselines) and (text_id in baselines[lang]))
+
+    expected = list(dict.fromkeys(itertools.chain(defined[None], references)))
+    report = {'files': len(filenames), 'languages': {}, 'duplicates': [], 'undefined': []}
+    for lang in languages:
+        missing = [text_id for text_id in expected if not is_defined(text_id, lang)]
+        orphaned = [name for name in defined[lang]
+                    if not is_defined(name, None) and (name not in references)]
+        coverage = (len(expected) - len(missing)) / len(expected) if expected else 1.0
+        report['languages'][lang] = {'defined': len(defined[lang]), 'expected': len(expected),
+                                     'coverage': round(coverage, 4),
+                                     'missing': missing, 'orphaned': orphaned}
+        print(f'{lang}: {coverage:.1%} of {len(expected)} strings, {len(missing)} missing, '
+              f'{len(orphaned)} orphaned...')
+    for lang, names in defined.items():
+        report['duplicates'].extend({'id': name, 'language': lang, 'files': files}
+                                    for name, files in names.items() if len(files) > 1)
+    report['undefined'] = [{'id': text_id, 'files': list(files)}
+                           for text_id, files in references.items()
+                           if not any(is_defined(text_id, lang) for lang in defined)]
+    for baseline in baselines.values():
+        baseline.close()
+    print(f'Found {len(report["duplicates"])} duplicate definitions '
+          f'and {len(report["undefined"])} undefined ids...')
+    if report_file is not None:
+        if report_format == 'csv':
+            data = text_bytes(write_report_csv, report)
         else:
-            locale_file_name = 'text_misc.xml'
-        locale_file_out(locale_dict, locale_file_name, None, language)
+            data = json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8')
+        write_file_atomically(report_file, data)
+        print(f'Finished writing report file {report_file}...')
     print('SUCCESS')
+    return report
+
+
+def summarize_events(events):
+    """Number and bytes of written files and sums of string counters
+    from instrument events of a run.
+    """
+    counters = {}
+    for event in events:
+        if event['event'] == 'counter':
+            counters[event['name']] = counters.get(event['name'], 0) + event['value']
+    written = [event for event in events
+               if (event['event'] == 'file') and (event.get('phase') == 'write')]
+    return {'files_written': len(written),
+            'bytes_written': sum(event['bytes_written'] for event in written),
+            'counters': counters}
+
+
+def run_in_memory(function, files, *args, **options):
+    """Runs function with files in memory as work directory
+    and a dict as output directory.
+    Returns ({filename: contents} of result files, statistics).
+    """
+    if 'instrument' in options:
+        raise Exception('Statistics of files in memory are collected without instrument')
+    result = {}
+    events = []
+    start = time.perf_counter()
+    function(files, result, *args, instrument=events.append, **options)
+    return result, {'seconds': round(time.perf_counter() - start, 6),
+                    **summarize_events(events)}
+
+
+def localize_files(files, language_attr, **options):
+    """Same as localize() but xml files are given and returned
+    in memory, so it can be used by a service without temporary
+    folders. Calls in several threads at once are independent
+    of each other, progress lines are printed as usual.
+
+    :param files: {filename: contents} of xml files as bytes,
+        same as files in work directory.
+
+    :param language_attr: Same as in localize().
+
+    Other parameters are the same as in localize(), except instrument
+    and options which need folders: incremental and workers > 1.
+    index_file and profile_file are still written to disk.
+
+    Returns ({filename: contents} of result files, statistics):
+    time in seconds, number and bytes of result files and sums
+    of string counters, such as copied strings. Subfolders of
+    split result files are separated by / in file names.
+    """
+    return run_in_memory(localize, files, language_attr, **options)
+
+
+def delocalize_files(files, language_attr, **options):
+    """Same as delocalize() but xml files are given and returned
+    in memory, see localize_files().
+
+    :param files: {filename: contents} of xml files as bytes,
+        same as files in work directory.
+
+    :param language_attr: Same as in delocalize().
+
+    Other parameters are the same as in delocalize(), except
+    instrument and options which need folders: incremental
+    and workers > 1.
+
+    Returns ({filename: contents} of result files, statistics),
+    counters have replaced strings.
+    """
+    return run_in_memory(delocalize, files, language_attr, **options)
+
+
+def watch(workdir, outputdir, language_attr, mode='localize', interval=0.5,
+          stop_event=None, on_update=None, instrument=None, profile_file=None, **options):
+    """Keeps output directory up to date while xml files are edited:
+    runs localize() or delocalize() in incremental mode, then checks
+    work directory every interval seconds and runs it again when files
+    are changed, added or removed. Manifest is kept in memory between
+    runs, so only changed files are read and parsed and only files whose
+    result is different are written: files with the same modification
+    time and size keep their hash from previous run. Stops when
+    stop_event is set or on Ctrl+C.
+
+    :param mode: 'localize' or 'delocalize'.
+
+    :param interval: Seconds between checks of work directory.
+
+    :param stop_event: threading.Event which stops watching when set,
+        for example from another thread.
+
+    :param on_update: Called with list of changed file names after
+        each run.
+
+    :param instrument: Same as in localize(), one instrument gets
+        events of all runs with an 'update' phase for each of them.
+
+    :param profile_file: Same as in localize(), for all runs.
+
+    Other parameters are passed to localize() or delocalize().
+    Returns the number of runs.
+    """
+
+    def snapshot():
+        """Modification times and sizes of xml files in work directory."""
+        result = {}
+        for filename in list_xml_files(workdir):
+            try:
+                stat = os.stat(os.path.join(workdir, filename))
+            except FileNotFoundError:
+                # Removed after listing
+                continue
+            result[filename] = (stat.st_mtime_ns, stat.st_size)
+        return result
+
+    def update(changed, unchanged=frozenset()):
+        """Runs the function for changed files."""
+        start = time.perf_counter()
+        token = current_unchanged.set(frozenset(unchanged))
+        try:
+            with phase('update', files=len(changed)):
+                function(workdir, outputdir, language_attr, incremental=True, **options)
+        finally:
+            current_unchanged.reset(token)
+        print(f'Updated {len(changed)} files in {time.perf_counter() - start:.3f} seconds...')
+        if on_update is not None:
+            on_update(changed)
+
+    check_dir(workdir)
+    if mode not in WATCH_MODES:
+        raise Exception(f'Watch mode must be one of {sorted(WATCH_MODES)}')
+    function = localize if mode == 'localize' else delocalize
+    if stop_event is None:
+        stop_event = threading.Event()
+    runs = 0
+    with instrumented(instrument, profile_file, 'watch', mode=mode, language=language_attr):
+        token = current_manifests.set({})
+        try:
+            files = snapshot()
+            update(sorted(files))
+            runs += 1
+            print(f'Watching {workdir}...')
+            # Changed since last successful run, failed run didn't
+            # save hashes of them
+            pending = set()
+            while not stop_event.wait(interval):
+                current = snapshot()
+                changed = sorted(filename for filename in set(files) | set(current)
+                                 if files.get(filename) != current.get(filename))
+                if not changed:
+                    continue
+                files = current
+                pending.update(changed)
+                print(f'Changed {", ".join(changed)}...')
+                try:
+                    update(changed, set(current) - pending)
+                    pending.clear()
+                except Exception as error:
+                    # File may be saved halfway, next change will be picked up
+                    print(f'Failed to update: {error}')
+                runs += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            current_manifests.reset(token)
+    print('Stopped watching...')
+    return runs
+
+
+def baseline_index_file(baseline, cache_dir, engine='bs4'):
+    """Index of vanilla text files in cache folder, built by
+    build_index() only if there is no index of the same files yet.
+    Index name is made from hash of file names and contents.
+    Returns path of the index file.
+    """
+    check_workdir(baseline)
+    key = hashlib.sha256(INDEX_MAGIC)
+    for filename in sorted(list_xml_files(baseline)):
+        key.update(f'{filename}\0{file_hash(baseline, filename)}\0'.encode('utf-8'))
+    index_file = os.path.join(cache_dir, f'baseline-{key.hexdigest()[:32]}.idx')
+    if os.path.isfile(index_file):
+        print(f'Using cached baseline {index_file}...')
+        return index_file
+    os.makedirs(cache_dir, exist_ok=True)
+    build_index(baseline, index_file, engine=engine)
+    return index_file
+
+
+def find_mods(root, include=('*',), exclude=(), skip=()):
+    """Paths of mods under root relative to it, with / separators:
+    folders with xml files ('.' for root itself) and .ftl/.zip mod
+    archives, found in all subfolders. Mods must match any of include
+    glob patterns, paths matching any of exclude patterns are not
+    searched, same as folders and archives from skip list.
+    """
+
+    def excluded(path):
+        """Checks path against exclude patterns."""
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in exclude)
+
+    def included(path):
+        """Checks path against include patterns."""
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in include)
+
+    skip = {os.path.abspath(path) for path in skip}
+    result = []
+    # Folders to search: (path, path relative to root)
+    folders = [(root, '')]
+    while folders:
+        directory, relative = folders.pop()
+        has_xml_files = False
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = f'{relative}{entry.name}'
+                if excluded(path) or (os.path.abspath(entry.path) in skip):
+                    continue
+                if entry.is_dir():
+                    folders.append((entry.path, f'{path}/'))
+                elif entry.name.lower().endswith(ARCHIVE_EXTENSIONS):
+                    if included(path):
+                        result.append(path)
+                elif is_xml_file(entry.name):
+                    has_xml_files = True
+        if has_xml_files and included(relative[:-1] or '.'):
+            result.append(relative[:-1] or '.')
+    return sorted(result)
+
+
+def run_batch_mod(task):
+    """Process pool task: runs localize() or delocalize() for one mod
+    of batch(), returns its summary and progress lines if they are
+    captured.
+    """
+    mode, workdir, outputdir, language_attr, options, capture = task
+    function = localize if mode == 'localize' else delocalize
+    events = []
+    log = io.StringIO()
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        with contextlib.redirect_stdout(log) if capture else contextlib.nullcontext():
+            parent = os.path.dirname(os.path.abspath(outputdir))
+            os.makedirs(parent, exist_ok=True)
+            function(workdir, outputdir, language_attr, instrument=events.append, **options)
+    except Exception as error:
+        status = str(error)
+        if not capture:
+            print(f'Failed to {mode} {workdir}: {error}')
+    summary = {'status': status, 'seconds': round(time.perf_counter() - start, 6),
+               **summarize_events(events)}
+    return summary, log.getvalue()
+
+
+def batch(root, outputdir, language_attr, mode='localize', baseline=None, cache_dir=None,
+          include=('*',), exclude=(), workers=1, summary_file=None, **options):
+    """Runs localize() or delocalize() for every mod found in a tree
+    of folders. Vanilla text files which mods append to are parsed
+    once: their strings are saved to an index in cache folder, named
+    after hash of the files, and all mods are run with it
+    as baseline_index. Next batch with the same vanilla files
+    uses the cached index.
+
+    :param root: Folder searched for mods: folders with xml files
+        and .ftl/.zip mod archives, subfolders are searched too.
+
+    :param outputdir: Result of each mod goes to the same path
+        relative to this folder as the mod has relative to root.
+
+    :param language_attr: Same as in localize() or delocalize().
+
+    :param mode: 'localize' or 'delocalize'.
+
+    :param baseline: Folder or mod archive with vanilla xml files,
+        None runs mods without baseline.
+
+    :param cache_dir: Folder of baseline indexes,
+        BASELINE_CACHE_DIR in outputdir by default.
+
+    :param include: Glob patterns of mod paths relative to root with
+        / separators, mods matching any of them are run.
+
+    :param exclude: Glob patterns of paths relative to root which
+        are skipped, folders matching them are not searched.
+
+    :param workers: Number of processes which run mods at the same
+        time, progress lines of each mod are printed when it's done.
+        On Windows call it under if __name__ == '__main__': when workers > 1.
+
+    :param summary_file: If set, summaries are saved to this JSON file.
+
+    Other parameters are passed to localize() or delocalize(),
+    except instrument and profile_file.
+
+    Returns list of summaries of mods: path, status ('ok' or error
+    message), seconds, number and bytes of written files and sums
+    of string counters, such as copied or replaced strings. Strings
+    of baseline are counted as baseline_copied_defined, apart from
+    copied_defined strings of the mod.
+    """
+    check_dir(root)
+    if mode not in WATCH_MODES:
+        raise Exception(f'Batch mode must be one of {sorted(WATCH_MODES)}')
+    if cache_dir is None:
+        cache_dir = os.path.join(outputdir, BASELINE_CACHE_DIR)
+    if baseline is not None:
+        options['baseline_index'] = baseline_index_file(baseline, cache_dir,
+                                                        options.get('engine', 'bs4'))
+    skip = [outputdir, cache_dir] + ([baseline] if baseline is not None else [])
+    mods = find_mods(root, include, exclude, skip)
+    print(f'Found {len(mods)} mods in {root}...')
+    capture = (workers > 1) and (len(mods) > 1)
+    tasks = [(mode, os.path.join(root, *path.split('/')),
+              os.path.join(outputdir, *path.split('/')), language_attr, options, capture)
+             for path in mods]
+    summaries = []
+    for path, (summary, log) in zip(mods, run_tasks(run_batch_mod, tasks, workers)):
+        if log:
+            print(f'Mod {path}:')
+            print(log, end='')
+        summaries.append({'mod': path, **summary})
+    failed = 0
+    for summary in summaries:
+        if summary['status'] == 'ok':
+            print(f'{summary["mod"]}: {summary["files_written"]} files written '
+                  f'in {summary["seconds"]:.3f} seconds')
+        else:
+            failed += 1
+            print(f'{summary["mod"]}: failed, {summary["status"]}')
+    if summary_file is not None:
+        with open(summary_file, 'w', encoding='utf-8') as file:
+            json.dump(summaries, file, ensure_ascii=False, indent=2)
+    print(f'Finished {len(mods)} mods, {failed} failed...')
+    return summaries
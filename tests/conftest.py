@@ -0,0 +1,38 @@
+"""Shared helpers of ftl_localizer tests."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_files(directory, files):
+    """Writes {filename: contents} to directory, str contents as utf-8."""
+    os.makedirs(directory, exist_ok=True)
+    for filename, contents in files.items():
+        if isinstance(contents, str):
+            contents = contents.encode('utf-8')
+        with open(os.path.join(directory, filename), 'wb') as file:
+            file.write(contents)
+
+
+def read_files(directory):
+    """{relative path: bytes} of all files under directory."""
+    result = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            with open(path, 'rb') as file:
+                result[os.path.relpath(path, directory).replace(os.sep, '/')] = file.read()
+    return result
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Generated mod with 30 top level events."""
+    from benchmarks.corpus import generate_corpus
+    directory = str(tmp_path / 'corpus')
+    generate_corpus(directory, 30)
+    return directory
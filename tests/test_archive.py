@@ -0,0 +1,70 @@
+"""Mod archive is read the same as a folder and opened once per run."""
+
+import os
+import tempfile
+import zipfile
+
+import pytest
+
+import ftl_localizer
+from conftest import read_files
+
+
+def make_archive(workdir, archive_file):
+    """Mod archive with files of workdir in data folder, in the same
+    order as they are listed in the folder.
+    """
+    with zipfile.ZipFile(archive_file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, data in read_files(workdir).items():
+            archive.writestr(ftl_localizer.ARCHIVE_DATA_DIR + filename, data)
+        archive.writestr('img/ship.png', b'not xml')
+    return archive_file
+
+
+@pytest.mark.parametrize('options', [{}, {'low_memory': True}, {'engine': 'lxml'}])
+def test_archive_opened_once(corpus, tmp_path, monkeypatch, options):
+    archive_file = make_archive(corpus, str(tmp_path / 'mod.ftl'))
+    ftl_localizer.localize(corpus, str(tmp_path / 'from_folder'), 'ru', **options)
+    opened = []
+    zip_file = zipfile.ZipFile
+
+    def counting_zip_file(file, *args, **kwargs):
+        opened.append(file)
+        return zip_file(file, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile, 'ZipFile', counting_zip_file)
+    ftl_localizer.localize(archive_file, str(tmp_path / 'from_archive'), 'ru', **options)
+    assert opened == [archive_file]
+    assert read_files(str(tmp_path / 'from_archive')) == read_files(str(tmp_path / 'from_folder'))
+
+
+def archive_contents(archive_file):
+    """{member name: (compress type, contents)} of archive."""
+    with zipfile.ZipFile(archive_file) as archive:
+        return {info.filename: (info.compress_type, archive.read(info))
+                for info in archive.infolist()}
+
+
+def test_archive_output_without_temporary_files(corpus, tmp_path, monkeypatch):
+    archive_file = make_archive(corpus, str(tmp_path / 'mod.ftl'))
+    staged = str(tmp_path / 'staged.ftl')
+    ftl_localizer.localize(archive_file, staged, 'ru', low_memory=True)
+
+    def no_temporary_directory(*args, **kwargs):
+        raise AssertionError('Results are staged in a temporary folder')
+
+    monkeypatch.setattr(tempfile, 'TemporaryDirectory', no_temporary_directory)
+    result = str(tmp_path / 'result.ftl')
+    ftl_localizer.localize(archive_file, result, 'ru')
+    assert archive_contents(result) == archive_contents(staged)
+    assert sorted(os.listdir(str(tmp_path))) == ['corpus', 'mod.ftl', 'result.ftl', 'staged.ftl']
+
+
+def test_archive_members_copied_through_public_api(corpus, tmp_path, monkeypatch):
+    archive_file = make_archive(corpus, str(tmp_path / 'mod.ftl'))
+    ftl_localizer.localize(archive_file, str(tmp_path / 'raw.ftl'), 'ru')
+    # Python version whose zipfile internals were not checked
+    monkeypatch.setattr(ftl_localizer, 'RAW_COPY_VERSIONS', ((3, 0), (3, 0)))
+    ftl_localizer.localize(archive_file, str(tmp_path / 'public.ftl'), 'ru')
+    assert archive_contents(str(tmp_path / 'public.ftl')) == \
+        archive_contents(str(tmp_path / 'raw.ftl'))
@@ -0,0 +1,58 @@
+"""Baseline index matters only with check_same_strings."""
+
+import ftl_localizer
+from conftest import read_files, write_files
+
+VANILLA = {'text_misc.xml': '<FTL><text name="vanilla_1">Shared string</text></FTL>\n'}
+MOD = {
+    'text_mod.xml': '<FTL><text name="mod_1">Shared string</text></FTL>\n',
+    'events.xml': '<FTL><event name="E"><text>Shared string</text></event></FTL>\n',
+}
+
+
+def make_index(tmp_path):
+    """Baseline index of vanilla text files."""
+    write_files(str(tmp_path / 'vanilla'), VANILLA)
+    index_file = str(tmp_path / 'vanilla.idx')
+    ftl_localizer.build_index(str(tmp_path / 'vanilla'), index_file)
+    return index_file
+
+
+def test_baseline_ignored_without_check_same_strings(tmp_path, capsys):
+    index_file = make_index(tmp_path)
+    workdir = str(tmp_path / 'mod')
+    write_files(workdir, MOD)
+    ftl_localizer.localize(workdir, str(tmp_path / 'plain'), 'ru')
+    capsys.readouterr()
+    ftl_localizer.localize(workdir, str(tmp_path / 'baseline'), 'ru', baseline_index=index_file)
+    assert 'doubly defined' not in capsys.readouterr().out
+    assert read_files(str(tmp_path / 'baseline')) == read_files(str(tmp_path / 'plain'))
+
+
+def test_baseline_used_with_check_same_strings(tmp_path, capsys):
+    index_file = make_index(tmp_path)
+    workdir = str(tmp_path / 'mod')
+    write_files(workdir, MOD)
+    capsys.readouterr()
+    ftl_localizer.localize(workdir, str(tmp_path / 'baseline'), 'ru', check_same_strings=True,
+                           baseline_index=index_file)
+    assert 'Found 1 doubly defined strings in text_mod.xml' in capsys.readouterr().out
+    # Vanilla id is used for the same string and it is not written again
+    workdir = str(tmp_path / 'events_only')
+    write_files(workdir, {'events.xml': MOD['events.xml']})
+    ftl_localizer.localize(workdir, str(tmp_path / 'events_only_out'), 'ru',
+                           check_same_strings=True, baseline_index=index_file)
+    result = read_files(str(tmp_path / 'events_only_out'))
+    assert b'<text id="vanilla_1"/>' in result['events.xml']
+    assert b'Shared string' not in result['text-ru.xml']
+
+
+def test_batch_counts_baseline_apart_from_mod(tmp_path):
+    write_files(str(tmp_path / 'vanilla'), VANILLA)
+    write_files(str(tmp_path / 'mods' / 'mod'), MOD)
+    summaries = ftl_localizer.batch(str(tmp_path / 'mods'), str(tmp_path / 'out'), 'ru',
+                                    baseline=str(tmp_path / 'vanilla'), check_same_strings=True)
+    counters = summaries[0]['counters']
+    assert counters['copied_defined'] == 1
+    assert counters['baseline_copied_defined'] == 1
+    assert counters['doubly_defined'] == 1
@@ -0,0 +1,73 @@
+"""lxml engine gives byte for byte the same result as bs4."""
+
+import pytest
+
+import ftl_localizer
+from conftest import read_files, write_files
+
+HEADER = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+EDGE_CASES = {
+    'comments': HEADER + '<FTL>\n<!-- top comment -->\n<event name="C">\n'
+                         '\t<!-- inside --><text>with comment</text>\n'
+                         '\t<choice><text>go<!-- in text --> on</text><event/></choice>\n'
+                         '</event>\n</FTL>\n',
+    'cdata': HEADER + '<FTL><event name="CD"><text><![CDATA[some <b>bold</b> & text]]></text>'
+                      '</event><textList name="L"><text><![CDATA[]]></text></textList></FTL>\n',
+    'mod_prefixes': HEADER + '<FTL><mod:findName type="event" name="X">'
+                             '<mod-append:choice><text>appended</text><event/>'
+                             '</mod-append:choice>'
+                             '</mod:findName><mod:findLike type="ship"><mod:setAttributes a="1"/>'
+                             '</mod:findLike><event name="M"><text>plain</text></event></FTL>\n',
+    'namespaces': '<FTL><wrap xmlns:m="urn:x" xmlns="urn:d"><m:x m:a="1"/></wrap>'
+                  '<m:event xmlns:m="urn:x" name="N" m:a="1"><text>ns text</text>'
+                  '<m:text>pre</m:text></m:event><event name="Q" a="x&quot;y" b="it\'s">'
+                  '<text>  spaced   </text></event></FTL>',
+    'bom': '﻿' + HEADER + '<FTL>\n<event name="BOM">\n<text>bom text</text>\n</event>\n</FTL>\n',
+    'crlf': (HEADER + '<FTL>\n<event name="CRLF">\n\t<text>line one\nline two</text>\n'
+                      '</event>\n<text name="defined">kept</text>\n</FTL>\n')
+            .replace('\n', '\r\n'),
+    'broken': '<event name="NOROOT"><text>hi</text></event>\n'
+              '<event name="UNCLOSED"><text>unclosed</text>\n'
+              '<textList name="T"><text>one</text><text>two</text></textList>',
+    # Parsers recover nothing after such comment, both the same way
+    'broken_comment': '<FTL><event name="D"><!--- dashes ---><text>hi</text></event></FTL>',
+    # xml namespace is never declared, its prefix is still kept
+    'xml_attributes': '<FTL><text name="a" xml:space="preserve">  kept  </text>'
+                      '<event name="X"><text xml:lang="en">lang</text></event></FTL>\n',
+    'doctype': HEADER + '<!-- before -->\n<!DOCTYPE FTL PUBLIC "-//FTL//EN" "ftl.dtd">\n'
+                        '<FTL><event name="DT"><text>with doctype</text></event></FTL>\n',
+    'doctype_entities': HEADER + '<!DOCTYPE FTL [<!ENTITY ship "Kestrel"><!-- in dtd -->]>\n'
+                                 '<FTL><event name="ENT"><text>The &ship; is here</text>'
+                                 '</event><text name="defined">&ship;</text></FTL>\n',
+}
+
+
+def run_engines(function, workdir, tmp_path, *args):
+    """Runs function with both engines, returns their result files."""
+    results = []
+    for engine in sorted(ftl_localizer.SUPPORTED_ENGINES):
+        outputdir = str(tmp_path / f'{function.__name__}_{engine}')
+        function(workdir, outputdir, *args, engine=engine)
+        results.append(read_files(outputdir))
+    return results
+
+
+@pytest.mark.parametrize('case', sorted(EDGE_CASES))
+def test_localize_and_delocalize_same_for_engines(case, tmp_path):
+    workdir = str(tmp_path / 'mod')
+    write_files(workdir, {f'{case}.xml': EDGE_CASES[case]})
+    bs4_result, lxml_result = run_engines(ftl_localizer.localize, workdir, tmp_path, 'ru')
+    assert bs4_result == lxml_result
+    bs4_result, lxml_result = run_engines(ftl_localizer.delocalize,
+                                          str(tmp_path / 'localize_bs4'), tmp_path, 'ru')
+    assert bs4_result == lxml_result
+
+
+def test_generated_mod_same_for_engines(corpus, tmp_path):
+    bs4_result, lxml_result = run_engines(ftl_localizer.localize, corpus, tmp_path, 'ru', True)
+    assert bs4_result == lxml_result
+    assert 'text-ru.xml' in bs4_result
+    bs4_result, lxml_result = run_engines(ftl_localizer.delocalize,
+                                          str(tmp_path / 'localize_bs4'), tmp_path, 'ru')
+    assert bs4_result == lxml_result
@@ -0,0 +1,34 @@
+"""Golden files of XML formatting: each file of golden/input written
+with pretty_xml() and write_ftl_xml() is the same file of golden/expected.
+"""
+
+import os
+
+import pytest
+
+import ftl_localizer
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+INPUT_DIR = os.path.join(GOLDEN_DIR, 'input')
+EXPECTED_DIR = os.path.join(GOLDEN_DIR, 'expected')
+
+
+def expected_text(filename):
+    """Expected formatting of input file."""
+    with open(os.path.join(EXPECTED_DIR, filename), 'r', encoding='utf-8', newline='') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('engine', sorted(ftl_localizer.SUPPORTED_ENGINES))
+@pytest.mark.parametrize('filename', sorted(os.listdir(INPUT_DIR)))
+def test_pretty_xml(filename, engine):
+    soup = ftl_localizer.parse_file(INPUT_DIR, filename, engine)
+    assert ftl_localizer.pretty_xml(soup) == expected_text(filename)
+
+
+@pytest.mark.parametrize('engine', sorted(ftl_localizer.SUPPORTED_ENGINES))
+@pytest.mark.parametrize('filename', sorted(os.listdir(INPUT_DIR)))
+def test_write_ftl_xml(filename, engine):
+    soup = ftl_localizer.parse_file(INPUT_DIR, filename, engine)
+    data = ftl_localizer.text_bytes(ftl_localizer.write_ftl_xml, soup)
+    assert data == expected_text(filename).replace('\n', os.linesep).encode('utf-8')
@@ -0,0 +1,49 @@
+"""localize_files() calls from several threads at once give the same
+results as the same calls one after another.
+"""
+
+import threading
+
+import ftl_localizer
+from benchmarks.corpus import generate_corpus
+from conftest import read_files
+
+# (corpus seed, options) of each call
+CALLS = [
+    (1, {}),
+    (2, {'check_same_strings': True}),
+    (3, {'engine': 'lxml'}),
+    (4, {'check_same_strings': True, 'split_result': True}),
+]
+
+
+def without_time(result):
+    """Result files and statistics of a call without its time."""
+    files, statistics = result
+    return files, {key: value for key, value in statistics.items() if key != 'seconds'}
+
+
+def test_threads_match_serial_calls(tmp_path):
+    inputs = []
+    for seed, options in CALLS:
+        directory = str(tmp_path / f'corpus_{seed}')
+        generate_corpus(directory, 20, seed)
+        inputs.append((read_files(directory), options))
+    expected = [without_time(ftl_localizer.localize_files(files, 'ru', **options))
+                for files, options in inputs]
+    # Every call runs twice, all of them start at the same time
+    tasks = inputs * 2
+    results = [None] * len(tasks)
+    barrier = threading.Barrier(len(tasks))
+
+    def run(number):
+        files, options = tasks[number]
+        barrier.wait()
+        results[number] = without_time(ftl_localizer.localize_files(files, 'ru', **options))
+
+    threads = [threading.Thread(target=run, args=(number,)) for number in range(len(tasks))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert results == expected * 2
@@ -0,0 +1,77 @@
+"""Incremental localize() gives the same files as a full run and
+parses only the files changed since the manifest was saved.
+"""
+
+import json
+import os
+
+import pytest
+
+import ftl_localizer
+from conftest import read_files, write_files
+
+
+def without_manifest(files):
+    """Result files without manifest of incremental run."""
+    return {filename: data for filename, data in files.items()
+            if filename != ftl_localizer.MANIFEST_FILE}
+
+
+def load_manifest(outputdir):
+    """Manifest saved by incremental run."""
+    path = os.path.join(outputdir, ftl_localizer.MANIFEST_FILE)
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def count_parsed(monkeypatch):
+    """Names of files parsed from now on."""
+    parsed = []
+    parse_file = ftl_localizer.parse_file
+
+    def counting_parse_file(workdir, filename, engine='bs4'):
+        parsed.append(filename)
+        return parse_file(workdir, filename, engine)
+
+    monkeypatch.setattr(ftl_localizer, 'parse_file', counting_parse_file)
+    return parsed
+
+
+@pytest.mark.parametrize('engine', ['bs4', 'lxml'])
+def test_second_run_matches_full_run(corpus, tmp_path, monkeypatch, engine):
+    outputdir = str(tmp_path / 'incremental')
+    ftl_localizer.localize(corpus, str(tmp_path / 'full'), 'ru', engine=engine)
+    full = read_files(str(tmp_path / 'full'))
+    ftl_localizer.localize(corpus, outputdir, 'ru', engine=engine, incremental=True)
+    assert without_manifest(read_files(outputdir)) == full
+    parsed = count_parsed(monkeypatch)
+    ftl_localizer.localize(corpus, outputdir, 'ru', engine=engine, incremental=True)
+    assert parsed == []
+    assert without_manifest(read_files(outputdir)) == full
+
+
+def test_edited_file_is_the_only_one_parsed(corpus, tmp_path, monkeypatch):
+    outputdir = str(tmp_path / 'incremental')
+    ftl_localizer.localize(corpus, outputdir, 'ru', incremental=True)
+    events = read_files(corpus)['events.xml']
+    write_files(corpus, {'events.xml': events.replace(b'<text>', b'<text>Edited ', 1)})
+    parsed = count_parsed(monkeypatch)
+    ftl_localizer.localize(corpus, outputdir, 'ru', incremental=True)
+    assert set(parsed) == {'events.xml'}
+    ftl_localizer.localize(corpus, str(tmp_path / 'full'), 'ru')
+    assert without_manifest(read_files(outputdir)) == read_files(str(tmp_path / 'full'))
+
+
+def test_deleted_file_leaves_manifest(corpus, tmp_path, capsys):
+    outputdir = str(tmp_path / 'incremental')
+    ftl_localizer.localize(corpus, outputdir, 'ru', incremental=True)
+    assert 'tutorial.xml' in load_manifest(outputdir)['files']
+    os.remove(os.path.join(corpus, 'tutorial.xml'))
+    capsys.readouterr()
+    ftl_localizer.localize(corpus, outputdir, 'ru', incremental=True)
+    assert 'Deleted outdated file tutorial.xml' in capsys.readouterr().out
+    manifest = load_manifest(outputdir)
+    assert 'tutorial.xml' not in manifest['files']
+    assert 'tutorial.xml' not in manifest['outputs']
+    ftl_localizer.localize(corpus, str(tmp_path / 'full'), 'ru')
+    assert without_manifest(read_files(outputdir)) == read_files(str(tmp_path / 'full'))
@@ -0,0 +1,72 @@
+"""Peak memory of low_memory runs depends on the largest file and the
+number of strings, not on the number of files.
+
+Memory is measured with tracemalloc, which sees Python objects only:
+bs4 trees are made of them, but lxml trees are allocated by libxml2
+and are not counted, so only the bs4 engine is tested.
+"""
+
+import contextlib
+import os
+import tracemalloc
+
+import ftl_localizer
+from conftest import write_files
+
+# Tags with no text make the tree big, a few events give it strings
+ANIMATIONS = 500
+EVENTS = 10
+
+
+def mod_file(number):
+    """Data file of the same size for each number."""
+    anims = ''.join(f'<anim name="anim_{number}_{i}"><sheet>sheet</sheet>'
+                    f'<desc length="4" x="0" y="{i % 10}"/><time>1.0</time></anim>\n'
+                    for i in range(ANIMATIONS))
+    events = ''.join(f'<event name="EVENT_{number}_{i}"><text>Text {i} of file {number}.</text>'
+                     f'<choice><text>Continue.</text><event/></choice></event>\n'
+                     for i in range(EVENTS))
+    return f'<FTL>\n{anims}{events}</FTL>\n'
+
+
+def peak_memory(function, *args, **kwargs):
+    """Peak memory in bytes allocated by Python during function call."""
+    tracemalloc.start()
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as sink, contextlib.redirect_stdout(sink):
+            function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_mod(directory, files):
+    """Mod with equal sized data files."""
+    write_files(directory, {f'data_{number}.xml': mod_file(number) for number in range(files)})
+    return directory
+
+
+def test_localize_low_memory_does_not_grow_with_files(tmp_path):
+    small = make_mod(str(tmp_path / 'small'), 2)
+    large = make_mod(str(tmp_path / 'large'), 8)
+    peaks = {}
+    for low_memory in (True, False):
+        peaks[low_memory] = [peak_memory(ftl_localizer.localize, workdir,
+                                         str(tmp_path / f'out_{low_memory}_{index}'), 'ru',
+                                         low_memory=low_memory)
+                             for index, workdir in enumerate((small, large))]
+    # All trees are kept without low_memory, this is what is measured
+    assert peaks[False][1] > peaks[False][0] * 2
+    assert peaks[True][1] < peaks[True][0] * 1.25
+
+
+def test_delocalize_low_memory_does_not_grow_with_files(tmp_path):
+    peaks = []
+    for files in (2, 8):
+        workdir = make_mod(str(tmp_path / f'mod_{files}'), files)
+        localized = str(tmp_path / f'localized_{files}')
+        with open(os.devnull, 'w', encoding='utf-8') as sink, contextlib.redirect_stdout(sink):
+            ftl_localizer.localize(workdir, localized, 'ru')
+        peaks.append(peak_memory(ftl_localizer.delocalize, localized,
+                                 str(tmp_path / f'out_{files}'), 'ru', low_memory=True))
+    assert peaks[1] < peaks[0] * 1.25
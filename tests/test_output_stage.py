@@ -0,0 +1,65 @@
+"""Failed run leaves no partially written files in output directory."""
+
+import pytest
+
+import ftl_localizer
+from conftest import read_files, write_files
+
+
+def fail_on_third_file(monkeypatch):
+    """Makes the third written file fail halfway through, after
+    half of its data is in the temporary file.
+    """
+    written = []
+    write_file_atomically = ftl_localizer.write_file_atomically
+
+    def failing_write(path, data, fsync=False):
+        written.append(path)
+        if len(written) == 3:
+            with ftl_localizer.atomic_file(path, fsync) as file:
+                file.write(data[:len(data) // 2])
+                raise OSError('No space left on device')
+        write_file_atomically(path, data, fsync)
+
+    monkeypatch.setattr(ftl_localizer, 'write_file_atomically', failing_write)
+
+
+def temporary_files(directory):
+    """Names of temporary files left in directory."""
+    return [filename for filename in read_files(directory) if filename.endswith('.tmp')]
+
+
+@pytest.mark.parametrize('writer_threads', [0, 1, 3])
+def test_failed_run_keeps_previous_output(corpus, tmp_path, monkeypatch, writer_threads):
+    outputdir = str(tmp_path / 'output')
+    ftl_localizer.localize(corpus, outputdir, 'ru', writer_threads=writer_threads)
+    previous = read_files(outputdir)
+    with monkeypatch.context() as patch:
+        fail_on_third_file(patch)
+        with pytest.raises(Exception):
+            ftl_localizer.localize(corpus, outputdir, 'ru', writer_threads=writer_threads)
+    assert read_files(outputdir) == previous
+    assert temporary_files(outputdir) == []
+
+
+@pytest.mark.parametrize('writer_threads', [0, 1, 3])
+def test_failed_run_writes_whole_files(corpus, tmp_path, monkeypatch, writer_threads):
+    outputdir = str(tmp_path / 'output')
+    ftl_localizer.localize(corpus, outputdir, 'ru', writer_threads=writer_threads)
+    previous = read_files(outputdir)
+    # Text of every event changes
+    edited = {filename: data.replace(b'<text>', b'<text>Edited ')
+              for filename, data in read_files(corpus).items()}
+    write_files(corpus, edited)
+    ftl_localizer.localize(corpus, str(tmp_path / 'new'), 'ru', writer_threads=writer_threads)
+    new = read_files(str(tmp_path / 'new'))
+    assert new != previous
+    fail_on_third_file(monkeypatch)
+    with pytest.raises(Exception):
+        ftl_localizer.localize(corpus, outputdir, 'ru', writer_threads=writer_threads)
+    result = read_files(outputdir)
+    assert sorted(result) == sorted(previous)
+    # Each file has either all of its previous or all of its new contents
+    for filename, data in result.items():
+        assert data in (previous[filename], new[filename]), filename
+    assert temporary_files(outputdir) == []
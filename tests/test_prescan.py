@@ -0,0 +1,55 @@
+"""prescan_files() never skips a file in which a full parse finds
+strings to localize, defined strings or ids to delocalize.
+"""
+
+import pytest
+
+import ftl_localizer
+from conftest import write_files
+
+HEADER = '<?xml version="1.0" encoding="utf-8"?>\n'
+CASES = {
+    'entity_text.xml': '<FTL><event><text>Fish &amp; chips</text></event></FTL>',
+    'entity_only.xml': '<FTL><event><text>&lt;&#62;</text></event></FTL>',
+    'entity_tag_name.xml': '<FTL><event>&lt;text&gt;'
+                           '<choice><text>&#x41;</text></choice></event></FTL>',
+    'entity_language.xml': '<FTL><text name="a" language=\'ru\'>&#1060;&amp;</text></FTL>',
+    'dtd_entity.xml': '<!DOCTYPE FTL [<!ENTITY e "<text>Entity</text>">]>'
+                      '<FTL><event>&e;</event></FTL>',
+    'cdata.xml': '<FTL><event><text><![CDATA[Hold <fire>!]]></text></event></FTL>',
+    'cdata_tags.xml': '<FTL><event><![CDATA[<text id="a"/>]]>'
+                      '<text>Real</text></event></FTL>',
+    'attr_order.xml': '<FTL><text load=\'x\' name="a">Hi</text></FTL>',
+    'attr_spaces.xml': '<FTL><text\n  language = \'ru\'\tname = "b" >Hi</text></FTL>',
+    'empty_and_full.xml': '<FTL><weaponBlueprint name=\'W\'><title length="4"\n/>'
+                          '<desc note="a>b" length=\'4\'>Real desc</desc>'
+                          '</weaponBlueprint></FTL>',
+    'id_quotes.xml': '<FTL><event><text id=\'e_1\'/></event></FTL>',
+    'id_spaces.xml': '<FTL><event><text load="a"\n\tid = "e_2"/></event></FTL>',
+    'id_substring.xml': '<FTL><weaponBlueprint name="W">'
+                        '<title uid="a" valid="1" id="w_title"/></weaponBlueprint></FTL>',
+    'id_substring_only.xml': '<FTL><weaponBlueprint name="W">'
+                             '<title uid="a" data-id="b" length="4"/></weaponBlueprint></FTL>',
+    'whitespace.xml': '<FTL><event><text>   </text>'
+                      '<choice><text>\n\t</text></choice></event></FTL>',
+    'nbsp.xml': '<FTL><event><text>&#160;</text></event></FTL>',
+}
+
+
+def scan(workdir, filename, engine, mode):
+    """Result of a full parse of file."""
+    if mode == 'localize':
+        return ftl_localizer.scan_file_for_localize((workdir, filename, engine))
+    return ftl_localizer.scan_file_for_delocalize((workdir, filename, engine, 'ru', False))
+
+
+@pytest.mark.parametrize('engine', ['bs4', 'lxml'])
+@pytest.mark.parametrize('mode', ['localize', 'delocalize'])
+def test_prescan_has_no_false_negatives(tmp_path, engine, mode):
+    workdir = str(tmp_path)
+    write_files(workdir, {filename: HEADER + body + '\n' for filename, body in CASES.items()})
+    needed = ftl_localizer.prescan_files(workdir, sorted(CASES), mode)[0]
+    found = [filename for filename in sorted(CASES)
+             if any(scan(workdir, filename, engine, mode))]
+    assert found
+    assert [filename for filename in found if filename not in needed] == []
@@ -0,0 +1,83 @@
+"""watch() keeps output the same as a full localize() run while files
+are edited, added and removed.
+"""
+
+import contextlib
+import io
+import os
+import queue
+import threading
+
+import ftl_localizer
+from conftest import read_files, write_files
+
+NEW_FILE = '<FTL><event name="NEW"><text>Brand new event</text></event></FTL>\n'
+
+
+def without_manifest(files):
+    """Result files without manifest of incremental run."""
+    return {filename: data for filename, data in files.items()
+            if filename != ftl_localizer.MANIFEST_FILE}
+
+
+def localized(workdir, outputdir):
+    """Result files of a full localize() run."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ftl_localizer.localize(workdir, outputdir, 'ru')
+    return read_files(outputdir)
+
+
+def replace_file(workdir, filename, contents):
+    """Writes file at once, so watch() never sees it half written."""
+    staging = os.path.join(os.path.dirname(workdir), 'staging')
+    write_files(staging, {filename: contents})
+    os.replace(os.path.join(staging, filename), os.path.join(workdir, filename))
+
+
+def edit(workdir, filename, old, new):
+    """Replaces first old with new in a file, size changes with it."""
+    with open(os.path.join(workdir, filename), 'r', encoding='utf-8') as file:
+        contents = file.read()
+    assert old in contents
+    replace_file(workdir, filename, contents.replace(old, new, 1))
+
+
+def test_watch_matches_full_localize(corpus, tmp_path, monkeypatch):
+    outputdir = str(tmp_path / 'watched')
+    stop_event = threading.Event()
+    updates = queue.Queue()
+    hashed = []
+    file_hash = ftl_localizer.file_hash
+
+    def counting_file_hash(directory, filename):
+        hashed.append(filename)
+        return file_hash(directory, filename)
+
+    monkeypatch.setattr(ftl_localizer, 'file_hash', counting_file_hash)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            ftl_localizer.watch(corpus, outputdir, 'ru', interval=0.02, stop_event=stop_event,
+                                on_update=updates.put)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        updates.get(timeout=60)
+        changes = [
+            (lambda: edit(corpus, 'events.xml', '<text>', '<text>Edited '), ['events.xml']),
+            (lambda: replace_file(corpus, 'new_events.xml', NEW_FILE), ['new_events.xml']),
+            (lambda: os.remove(os.path.join(corpus, 'tutorial.xml')), ['tutorial.xml']),
+        ]
+        for number, (change, changed) in enumerate(changes):
+            hashed.clear()
+            change()
+            assert updates.get(timeout=60) == changed
+            # Only changed files are read again
+            assert sorted(hashed) == [name for name in changed if name != 'tutorial.xml']
+            assert without_manifest(read_files(outputdir)) == \
+                localized(corpus, str(tmp_path / f'full_{number}'))
+    finally:
+        stop_event.set()
+        thread.join(60)
+    assert not thread.is_alive()
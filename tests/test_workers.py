@@ -0,0 +1,52 @@
+"""A pool of workers gives the same files and the same printed counters
+as a single process run.
+"""
+
+import pytest
+
+import ftl_localizer
+from conftest import read_files, write_files
+
+DUPLICATES = {
+    'text_dup.xml': '<FTL><text name="dup_a">Same string</text>'
+                    '<text name="dup_b">Same string</text>'
+                    '<text name="dup_name">First</text>'
+                    '<text name="dup_name">Second</text></FTL>\n',
+    'events_dup.xml': '<FTL><event name="DUP_1"><text>Same string</text></event>'
+                      '<event name="DUP_2"><text>Same string</text>'
+                      '<choice><text>First</text></choice></event></FTL>\n',
+}
+
+
+def run(capsys, function, workdir, outputdir, workers, **options):
+    """Result files and printed lines of a run."""
+    capsys.readouterr()
+    function(workdir, outputdir, 'ru', workers=workers, **options)
+    return read_files(outputdir), capsys.readouterr().out
+
+
+@pytest.mark.parametrize('options', [{}, {'check_same_strings': True},
+                                     {'check_same_strings': True, 'engine': 'lxml'}])
+def test_localize_workers_match_single_process(corpus, tmp_path, capsys, options):
+    write_files(corpus, DUPLICATES)
+    single = run(capsys, ftl_localizer.localize, corpus, str(tmp_path / 'single'), 1, **options)
+    pool = run(capsys, ftl_localizer.localize, corpus, str(tmp_path / 'pool'), 3, **options)
+    assert pool == single
+    assert 'Found 1 doubly defined strings in text_dup.xml' in pool[1]
+    if options.get('check_same_strings'):
+        # The last definition of a string wins
+        assert b'<text id="dup_b"/>' in pool[0]['events_dup.xml']
+        assert 'Found 3 repeats in events_dup.xml' in pool[1]
+
+
+@pytest.mark.parametrize('engine', ['bs4', 'lxml'])
+def test_delocalize_workers_match_single_process(corpus, tmp_path, capsys, engine):
+    write_files(corpus, DUPLICATES)
+    localized = str(tmp_path / 'localized')
+    ftl_localizer.localize(corpus, localized, 'ru', check_same_strings=True)
+    single = run(capsys, ftl_localizer.delocalize, localized, str(tmp_path / 'single'), 1,
+                 engine=engine)
+    pool = run(capsys, ftl_localizer.delocalize, localized, str(tmp_path / 'pool'), 3,
+               engine=engine)
+    assert pool == single
+    assert 'Replaced' in pool[1]